@@ -0,0 +1,90 @@
+"""Execução em lote (sem Streamlit) dos alertas de TEDs e Convênios.
+
+Carrega as três planilhas, classifica os prazos com as mesmas regras do painel e grava os itens
+atrasados e próximos do vencimento em CSV ou JSON. O código de saída é o número de alertas
+(limitado a 124), para que o agendador possa reagir sem ler o arquivo; 125 e 126 indicam falha
+(argumentos inválidos ou erro ao ler/gravar; nenhuma planilha carregada):
+
+    python alertas_batch.py --formato json --saida alertas.json
+"""
+import argparse
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+
+from carregamento import CACHE_PLANILHAS
+from instrumentacao import VARIAVEL_ARQUIVO_METRICAS, medir
+from processamento import FONTES, derivar_prazos, STATUS_PRAZO_ATRASADO, STATUS_PRAZO_PROXIMO, STATUS_PRAZO_ATENCAO
+
+COLUNAS_ALERTA = ['Fonte', 'ID_Item', 'Objeto', 'Proponente', 'Status', 'Data Pagamento', 'Dias Restantes', 'Dias Atraso', 'Status Prazo', 'Valor_Calculo']
+CODIGO_SAIDA_MAXIMO_ALERTAS = 124 # códigos acima disso indicam falha ou têm significado especial no shell
+CODIGO_SAIDA_ERRO = 125 # argumentos inválidos ou erro ao carregar/gravar (nunca confundido com uma contagem)
+CODIGO_SAIDA_SEM_DADOS = 126 # nenhuma planilha pôde ser carregada
+
+
+class ArgumentParserAlertas(argparse.ArgumentParser):
+    """Erro de uso sai com `CODIGO_SAIDA_ERRO` (o argparse usaria 2, que se leria como 2 alertas)."""
+
+    def error(self, message):
+        self.print_usage(sys.stderr)
+        self.exit(CODIGO_SAIDA_ERRO, f"{self.prog}: erro: {message}\n")
+
+
+def coletar_alertas(arquivos, status_alerta, data_referencia=None):
+    """Devolve `(alertas, erros, fontes_carregadas)`: um DataFrame com os itens de todas as fontes cujo
+    'Status Prazo' (na `data_referencia`, padrão hoje) está em `status_alerta`, a lista de mensagens de
+    erro e quantas fontes tinham dados."""
+    partes, erros = [], []
+    for tipo, (arquivo_padrao, preparador) in FONTES.items():
+        arquivo = arquivos.get(tipo) or arquivo_padrao # arquivo, diretório ou glob
+        base, erro = CACHE_PLANILHAS.carregar_varios(arquivo, preparador)
+        if erro: erros.append(f"{tipo}: {erro}")
+        if base.empty: continue
+        with medir('derivar_prazos', fonte=tipo) as registro: registro['df'] = df = derivar_prazos(base, data_referencia)
+        colunas = COLUNAS_ALERTA + (['Arquivo_Origem'] if 'Arquivo_Origem' in df.columns else [])
+        partes.append(df[df['Status Prazo'].isin(status_alerta)].assign(Fonte=tipo)[colunas])
+    if not partes: return pd.DataFrame(columns=COLUNAS_ALERTA), erros, 0
+    alertas = pd.concat(partes, ignore_index=True)
+    alertas['Status Prazo'] = alertas['Status Prazo'].astype(str)
+    return alertas.sort_values(['Dias Atraso', 'Dias Restantes'], ascending=[False, True], ignore_index=True), erros, len(partes)
+
+
+def gravar_alertas(alertas, saida, formato):
+    destino = sys.stdout if saida == '-' else saida
+    if formato == 'json':
+        alertas.to_json(destino, orient='records', date_format='iso', force_ascii=False, indent=2)
+    else:
+        alertas.to_csv(destino, index=False, date_format='%Y-%m-%d')
+
+
+def main(argv=None):
+    parser = ArgumentParserAlertas(description="Gera os alertas de prazo de TEDs e Convênios sem abrir o painel.")
+    parser.add_argument('--formato', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--saida', default='-', help="arquivo de saída ('-' para a saída padrão)")
+    parser.add_argument('--data-referencia', type=date.fromisoformat, help="calcula os prazos como se hoje fosse esta data (AAAA-MM-DD)")
+    parser.add_argument('--incluir-atencao', action='store_true', help=f"inclui também os itens '{STATUS_PRAZO_ATENCAO}'")
+    parser.add_argument('--teds-enviados', help="planilha(s) de TEDs enviados: arquivo, diretório ou glob (padrão: '%s')" % FONTES['TEDs_Enviados'][0])
+    parser.add_argument('--teds-recebidos', help="planilha(s) de TEDs recebidos: arquivo, diretório ou glob (padrão: '%s')" % FONTES['TEDs_Recebidos'][0])
+    parser.add_argument('--convenios', help="planilha(s) de convênios: arquivo, diretório ou glob (padrão: '%s')" % FONTES['Convenios'][0])
+    parser.add_argument('--metricas', help="acrescenta a este arquivo (JSON Lines) o tempo, as linhas e a memória de cada etapa da carga")
+    args = parser.parse_args(argv)
+    if args.metricas: os.environ[VARIAVEL_ARQUIVO_METRICAS] = args.metricas # pela variável, vale também nos processos filhos
+
+    status_alerta = [STATUS_PRAZO_ATRASADO, STATUS_PRAZO_PROXIMO] + ([STATUS_PRAZO_ATENCAO] if args.incluir_atencao else [])
+    arquivos = {'TEDs_Enviados': args.teds_enviados, 'TEDs_Recebidos': args.teds_recebidos, 'Convenios': args.convenios}
+    try: alertas, erros, fontes_carregadas = coletar_alertas(arquivos, status_alerta, args.data_referencia)
+    except Exception as e: print(f"Erro ao carregar as planilhas: {e}", file=sys.stderr); return CODIGO_SAIDA_ERRO
+    for erro in erros: print(erro, file=sys.stderr)
+    if fontes_carregadas == 0: return CODIGO_SAIDA_SEM_DADOS
+
+    try: gravar_alertas(alertas, args.saida, args.formato)
+    except Exception as e: print(f"Erro ao gravar '{args.saida}': {e}", file=sys.stderr); return CODIGO_SAIDA_ERRO
+    contagem = alertas['Status Prazo'].value_counts()
+    print(f"{len(alertas)} alerta(s): " + ", ".join(f"{n} {status}" for status, n in contagem.items()), file=sys.stderr)
+    return min(len(alertas), CODIGO_SAIDA_MAXIMO_ALERTAS)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from processamento import STATUS_PRAZO_ATRASADO, STATUS_PRAZO_PROXIMO, derivar_prazos, normalizar_id_item
+
+# --- Atualização incremental das planilhas ---
+# Cada linha da planilha lida recebe uma impressão digital (hash de todas as suas células), guardada
+# na coluna 'Hash_Linha' do DataFrame processado. Quando a planilha muda, as linhas cujo hash já
+# existia na versão anterior são reaproveitadas como estão e só as novas ou alteradas passam pelo
+# processador. O diff por item ('ID_Item') alimenta o registro de mudanças do painel.
+FRACAO_MAXIMA_DELTA = 0.5 # acima disso reprocessar tudo de uma vez sai mais barato
+STATUS_PRAZO_ALERTA = [STATUS_PRAZO_ATRASADO, STATUS_PRAZO_PROXIMO]
+# O que conta como item alterado no registro de mudanças: as colunas internas, não a linha bruta (uma
+# coluna da planilha que o processador não usa não muda o item).
+COLUNAS_COMPARADAS = ['ID_Item', 'Objeto', 'Proponente', 'Status', 'Data Pagamento', 'Valor_Calculo']
+
+
+def texto_celula(valor):
+    """Forma canônica de uma célula: o mesmo valor dá o mesmo texto qualquer que seja o dtype da coluna
+    (5, 5.0 e np.int64(5) -> '5'; datas num formato fixo)."""
+    if isinstance(valor, (bool, np.bool_)): return str(bool(valor))
+    if isinstance(valor, (int, np.integer)): return str(int(valor))
+    if isinstance(valor, (float, np.floating)):
+        valor = float(valor)
+        return str(int(valor)) if valor.is_integer() and abs(valor) < 2**53 else repr(valor)
+    if isinstance(valor, (datetime, np.datetime64)): return pd.Timestamp(valor).strftime('%Y-%m-%d %H:%M:%S.%f')
+    return str(valor)
+
+
+def hash_linhas(df_raw):
+    """Impressão digital (uint64) de cada linha da planilha, sem o índice.
+
+    O hash é do texto canônico de cada célula (`texto_celula`), não do valor tipado: o
+    `hash_pandas_object` leva o dtype em conta, e uma única célula apagada (int64 -> float64) ou com
+    texto numa coluna de números (-> object) mudaria o hash de todas as linhas.
+    """
+    colunas = {}
+    for i, coluna in enumerate(df_raw.columns):
+        codigos, unicos = pd.factorize(df_raw.iloc[:, i]) # cada valor distinto é convertido uma vez
+        hashes_unicos = pd.util.hash_array(np.array([texto_celula(v) for v in unicos], dtype=object))
+        colunas[i] = np.where(codigos >= 0, hashes_unicos[np.maximum(codigos, 0)] if len(unicos) else 0, np.uint64(0)) # 0: célula vazia
+    return pd.util.hash_pandas_object(pd.DataFrame(colunas, index=df_raw.index), index=False).to_numpy()
+
+
+def colunas_planilha(df_raw):
+    return [str(col) for col in df_raw.columns]
+
+
+def _primeiros_preenchidos(df_raw):
+    return df_raw.notna().to_numpy().argmax(axis=0)
+
+
+def linhas_de_contexto(df_raw):
+    """Posições do primeiro valor preenchido de cada coluna.
+
+    Processadas junto com as linhas alteradas, fazem as inferências feitas por lote (ex.: o formato de
+    data que o `pd.to_datetime` deduz do primeiro valor) darem o mesmo resultado da planilha inteira.
+    """
+    return np.unique(_primeiros_preenchidos(df_raw))
+
+
+def hashes_de_contexto(df_raw, hashes):
+    """Hash da linha de contexto de cada coluna, guardado em `attrs` para a próxima versão comparar."""
+    return [int(h) for h in hashes[_primeiros_preenchidos(df_raw)]]
+
+
+def processar_delta(df_raw, hashes, anterior, processador):
+    """Processa só as linhas de `df_raw` que não existiam em `anterior` (a versão processada anterior).
+
+    Devolve `(df, linhas_processadas)`, ou `None` quando o delta não se aplica (colunas da planilha
+    mudaram, versão anterior sem hashes, mudança grande demais, linha de contexto nova ou diferente da
+    anterior, ou erro do processador, que então é reportado pelo processamento completo).
+    """
+    if 'Hash_Linha' not in anterior.columns or anterior.attrs.get('colunas_planilha') != colunas_planilha(df_raw): return None
+    # As linhas reaproveitadas foram convertidas com as inferências da versão anterior: se a linha que
+    # as guia mudou (ex.: outra data no topo da coluna), o processamento completo pode dar outro resultado.
+    if anterior.attrs.get('hashes_contexto') != hashes_de_contexto(df_raw, hashes): return None
+    hashes_anteriores = anterior['Hash_Linha'].to_numpy()
+    unicos = ~pd.Series(hashes_anteriores).duplicated().to_numpy() # linhas idênticas: qualquer uma serve
+    posicao_anterior = pd.Index(hashes_anteriores[unicos]).get_indexer(hashes)
+    reaproveitada = posicao_anterior >= 0
+    novas = np.flatnonzero(~reaproveitada)
+    if len(novas) > FRACAO_MAXIMA_DELTA * len(df_raw) or np.isin(linhas_de_contexto(df_raw), novas).any(): return None
+
+    partes = [anterior.iloc[np.flatnonzero(unicos)[posicao_anterior[reaproveitada]]].set_axis(np.flatnonzero(reaproveitada))]
+    if len(novas):
+        processado, erro = processador(df_raw.iloc[np.union1d(novas, linhas_de_contexto(df_raw))])
+        if erro or processado is None: return None
+        partes.append(processado.loc[df_raw.index[novas]].set_axis(novas))
+    df = pd.concat(partes).sort_index().reset_index(drop=True)[anterior.columns.drop('Hash_Linha', errors='ignore')]
+    df.attrs = dict(anterior.attrs)
+    if 'Valor_Coagido' in df.columns: df.attrs['valores_coagidos'] = int(df['Valor_Coagido'].sum())
+    return df, len(novas)
+
+
+def _por_item(df, data_referencia):
+    """Hash das colunas internas ('Hash_Item') e 'Status Prazo' por item; IDs repetidos são pareados pela ordem em que aparecem."""
+    prazos = derivar_prazos(df, data_referencia)
+    ids = normalizar_id_item(df['ID_Item']) # 1234 e 1234.0 (coluna que virou float) são o mesmo item
+    internas = df[[c for c in COLUNAS_COMPARADAS if c in df.columns]].assign(ID_Item=ids)
+    internas = internas.astype({c: str for c in ['Status'] if c in internas.columns}) # categorias diferentes entre versões
+    hashes = pd.util.hash_pandas_object(internas, index=False).to_numpy()
+    chave = pd.MultiIndex.from_arrays([ids.fillna('nan'), ids.groupby(ids, dropna=False, sort=False).cumcount()], names=['chave', 'ocorrencia'])
+    return pd.DataFrame({'ID_Item': df['ID_Item'].to_numpy(), 'Proponente': df['Proponente'].to_numpy(), 'Hash_Item': pd.array(hashes, dtype='UInt64'), # nulo no join sem virar float
+                         'Status Prazo': prazos['Status Prazo'].astype(str).to_numpy()}, index=chave)
+
+
+def comparar_versoes(anterior, novo, data_anterior=None, data_nova=None):
+    """Resumo das mudanças entre duas versões processadas da mesma planilha.
+
+    Devolve `{'novos', 'removidos', 'modificados', 'transicoes'}`; `transicoes` lista os itens que
+    entraram em 'Atrasado' ou 'Próximo' (prazos da versão anterior em `data_anterior`, da nova em
+    `data_nova`), inclusive os que mudaram só porque o tempo passou.
+    """
+    a, n = _por_item(anterior, data_anterior), _por_item(novo, data_nova)
+    juntos = a.join(n, how='outer', lsuffix='_antes', rsuffix='_agora')
+    existia, existe = juntos['Hash_Item_antes'].notna(), juntos['Hash_Item_agora'].notna()
+    entrou = existe & juntos['Status Prazo_agora'].isin(STATUS_PRAZO_ALERTA) & (juntos['Status Prazo_antes'] != juntos['Status Prazo_agora'])
+    transicoes = juntos[entrou]
+    return {
+        'novos': int((existe & ~existia).sum()), 'removidos': int((existia & ~existe).sum()),
+        'modificados': int((existia & existe & (juntos['Hash_Item_antes'] != juntos['Hash_Item_agora'])).sum()),
+        'transicoes': [{'ID_Item': None if pd.isna(i) else i, 'Proponente': p, 'de': d if isinstance(d, str) else None, 'para': para}
+                       for i, p, d, para in zip(transicoes['ID_Item_agora'], transicoes['Proponente_agora'], transicoes['Status Prazo_antes'], transicoes['Status Prazo_agora'])],
+    }
@@ -0,0 +1,219 @@
+"""Benchmark das etapas de carga e renderização com planilhas sintéticas.
+
+Gera 'TED Alert.xlsx', 'TED Recebido.xlsx' e 'Convenios.xlsx' sintéticos (com as colunas que os
+processadores esperam, valores monetários em formatos variados e datas misturadas), mede cada etapa
+separadamente (tempo e pico de memória) e compara com um baseline salvo em JSON:
+
+    python benchmarks/benchmark_alertas.py --tamanhos 1000 10000
+    python benchmarks/benchmark_alertas.py --salvar-baseline
+
+As planilhas geradas ficam em `benchmarks/dados/` e são reaproveitadas entre execuções.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from busca import IndiceBusca  # noqa: E402
+from cards_html import CLASSES_CARD_STATUS_PRAZO, create_flip_card_detalhe, gerar_html_cards, ordenar_para_cards  # noqa: E402
+from processamento import ESQUEMAS_FONTES, converter_valor_monetario, converter_valores_monetarios, derivar_prazos, preparar_base  # noqa: E402
+
+TAMANHOS_PADRAO = [1_000, 10_000, 100_000, 1_000_000]
+ARQUIVOS_SINTETICOS = {"TEDs_Enviados": 'TED Alert.xlsx', "TEDs_Recebidos": 'TED Recebido.xlsx', "Convenios": 'Convenios.xlsx'}
+DIRETORIO_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados')
+ARQUIVO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados.json')
+ARQUIVO_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+PISO_RUIDO_SEGUNDOS = 0.005 # diferenças menores que isso não contam como regressão
+CARDS_POR_PAGINA = 40
+
+STATUS_SINTETICOS = ['Em execução', 'Em Execução', 'Ativo', 'Prestação de contas', 'Concluído', 'CONCLUÍDO']
+UNIDADES_SINTETICAS = ['MMA - Ministério do Meio Ambiente', 'IBAMA', 'FUNDACAO ESPIRITO SANTENSE DE TECNOLOGIA - FEST', 'Universidade da Amazônia', 'ONG Ecologia Viva', 'FUNDACAO DO MUSEU DO HOMEM AMERICANO']
+
+
+# --- Geração das planilhas sintéticas ---
+
+def _valores_baguncados(rng, n):
+    """Valores como aparecem nas planilhas reais: números, 'R$ 1.234,56', '1,234.56', '1234,5', vazios e lixo."""
+    centavos = rng.integers(0, 5_000_000_000, n)
+    formato = rng.choice(8, n, p=[.30, .20, .15, .10, .10, .05, .05, .05])
+    valores = []
+    for c, f in zip(centavos.tolist(), formato.tolist()):
+        reais = c / 100
+        br = f'{reais:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+        if f == 0: valores.append(reais)
+        elif f == 1: valores.append(f'R$ {br}')
+        elif f == 2: valores.append(br)
+        elif f == 3: valores.append(f'{reais:,.2f}')
+        elif f == 4: valores.append(f'{reais:.1f}'.replace('.', ','))
+        elif f == 5: valores.append(int(reais))
+        elif f == 6: valores.append(None)
+        else: valores.append('N/D')
+    return valores
+
+
+def _datas(rng, n, dayfirst_texto, frac_texto, frac_vazio):
+    hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    dias = rng.integers(-400, 900, n).tolist()
+    sorteio = rng.random(n).tolist()
+    datas = []
+    for d, r in zip(dias, sorteio):
+        data = hoje + timedelta(days=d)
+        if r < frac_vazio: datas.append(None)
+        elif r < frac_vazio + frac_texto: datas.append(data.strftime('%d/%m/%Y' if dayfirst_texto else '%Y-%m-%d'))
+        else: datas.append(data)
+    return datas
+
+
+def gerar_dataframe_sintetico(tipo, n, semente=42):
+    rng = np.random.default_rng(semente)
+    ids = [f'{i:06d}/{2015 + i % 10}' for i in range(n)]
+    processos = [f'02070.{i % 999999:06d}/{2015 + i % 10}-{i % 97:02d}' for i in range(n)]
+    status = rng.choice(STATUS_SINTETICOS, n).tolist()
+    unidades = rng.choice(UNIDADES_SINTETICAS, n).tolist()
+    valores = _valores_baguncados(rng, n)
+    if tipo == "TEDs_Enviados":
+        return pd.DataFrame({
+            'TED': [f'TED{i:06d}/{2020 + i % 5}' for i in range(n)], 'Objeto': [f'Apoio à gestão da UC {i % 300}' for i in range(n)],
+            'Convenente': unidades, 'Data Pagamento': _datas(rng, n, False, 0.0, 0.0), 'Status': status,
+            'Valor (Opcional)': valores, 'Responsável (Opcional)': rng.choice(['Ana Silva', 'João Costa', None], n).tolist(),
+        })
+    vigencia_fim = _datas(rng, n, True, 0.2, 0.1)
+    comum = {
+        'Nº CONVÊNIO': ids, 'PROCESSO': processos, 'SITUAÇÃO': status, 'ANO': rng.integers(2015, 2026, n).tolist(), 'VALOR': valores,
+        'VIGÊNCIA': [f'01/01/2024 a {d.strftime("%d/%m/%Y")}' if isinstance(d, datetime) else None for d in vigencia_fim],
+        'FIM DE VIGÊNCIA': vigencia_fim,
+    }
+    if tipo == "TEDs_Recebidos":
+        return pd.DataFrame({'UNIDADE DESCENTRALIZADORA': unidades, **comum})
+    return pd.DataFrame({'PROPONENTE': unidades, 'CNPJ': [f'{i % 99:02d}.{i % 999:03d}.103/0001-{i % 99:02d}' for i in range(n)],
+                         'ORIGEM DO RECURSO': rng.choice(['PRECATÓRIOS', 'C. EXTRAORD. YANOMAMI', None], n).tolist(), **comum})
+
+
+def gerar_planilha(tipo, n, diretorio=DIRETORIO_DADOS, semente=42):
+    """Caminho da planilha sintética `tipo` com `n` linhas, gerando-a se ainda não existir."""
+    nome_base, extensao = os.path.splitext(ARQUIVOS_SINTETICOS[tipo])
+    caminho = os.path.join(diretorio, f'{nome_base} {n}{extensao}')
+    if os.path.exists(caminho): return caminho
+    os.makedirs(diretorio, exist_ok=True)
+    df = gerar_dataframe_sintetico(tipo, n, semente)
+    # openpyxl em modo write-only: df.to_excel leva minutos a mais na casa do milhão de linhas.
+    wb = Workbook(write_only=True); ws = wb.create_sheet()
+    ws.append(list(df.columns))
+    for linha in df.itertuples(index=False, name=None): ws.append(list(linha))
+    wb.save(caminho + '.tmp'); os.replace(caminho + '.tmp', caminho)
+    return caminho
+
+
+# --- Medição ---
+
+def medir(funcao, *args, memoria=True):
+    """Executa `funcao(*args)` e devolve `(resultado, {'segundos', 'pico_mb'})`.
+
+    O pico de memória vem de uma segunda execução sob tracemalloc, para não distorcer o tempo.
+    """
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    medida = {'segundos': round(time.perf_counter() - inicio, 6)}
+    if memoria:
+        tracemalloc.start()
+        try: funcao(*args); medida['pico_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 3)
+        finally: tracemalloc.stop()
+    return resultado, medida
+
+
+def html_cards_por_linha(df):
+    """Grade de cards montada card a card (`create_flip_card_detalhe`): a referência de `gerar_html_cards`."""
+    return '<div class="cards-grid">' + ''.join(
+        create_flip_card_detalhe(id_item, objeto, proponente, data, valor, CLASSES_CARD_STATUS_PRAZO.get(prazo, "card-default"))
+        for id_item, objeto, proponente, data, valor, prazo in zip(df['ID_Item'], df['Objeto'], df['Proponente'], df['Data Pagamento'], df['Valor_Calculo'], df['Status Prazo'])) + '</div>'
+
+
+def medir_fonte(tipo, caminho, memoria=True):
+    esquema = ESQUEMAS_FONTES[tipo]
+    coluna_valor = next(col for col, interna in esquema['map_colunas'].items() if interna == 'Valor_Calculo')
+    etapas = {}
+    raw, etapas['read_excel'] = medir(pd.read_excel, caminho, memoria=memoria)
+    _, etapas['converter_valor_monetario'] = medir(lambda s: s.apply(converter_valor_monetario), raw[coluna_valor], memoria=memoria)
+    _, etapas['converter_valores_monetarios'] = medir(converter_valores_monetarios, raw[coluna_valor], memoria=memoria)
+    (base, erro), etapas['preparar_base'] = medir(preparar_base, raw, esquema, memoria=memoria)
+    if erro: raise RuntimeError(f"{tipo}: {erro}")
+    derivado, etapas['classificacao_prazos'] = medir(derivar_prazos, base, memoria=memoria)
+    ordenado, etapas['ordenacao_cards'] = medir(ordenar_para_cards, derivado, memoria=memoria)
+    _, etapas['html_cards_pagina'] = medir(gerar_html_cards, ordenado.iloc[:CARDS_POR_PAGINA], memoria=memoria)
+    _, etapas['html_cards_pagina_por_linha'] = medir(html_cards_por_linha, ordenado.iloc[:CARDS_POR_PAGINA], memoria=memoria)
+    _, etapas['html_cards_todos'] = medir(gerar_html_cards, ordenado, memoria=memoria)
+    _, etapas['html_cards_todos_por_linha'] = medir(html_cards_por_linha, ordenado, memoria=memoria)
+    indice_busca, etapas['indexar_busca'] = medir(IndiceBusca, base, memoria=memoria)
+    _, etapas['buscar'] = medir(indice_busca.buscar, 'fundação espírito', memoria=memoria)
+    for medida in etapas.values(): medida['linhas'] = len(raw)
+    return etapas
+
+
+def comparar(resultados, baseline, tolerancia):
+    """Lista de `(tipo, n, etapa, atual, anterior)` das etapas que ficaram mais lentas que o baseline."""
+    regressoes = []
+    for tipo, por_tamanho in resultados.items():
+        for n, etapas in por_tamanho.items():
+            for etapa, medida in etapas.items():
+                anterior = baseline.get(tipo, {}).get(n, {}).get(etapa)
+                if not anterior: continue
+                atual, antes = medida['segundos'], anterior['segundos']
+                if atual > antes * (1 + tolerancia) and atual - antes > PISO_RUIDO_SEGUNDOS:
+                    regressoes.append((tipo, n, etapa, atual, antes))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das etapas de carga e renderização do painel de alertas.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO, help="número de linhas das planilhas sintéticas")
+    parser.add_argument('--fontes', nargs='+', choices=list(ARQUIVOS_SINTETICOS), default=list(ARQUIVOS_SINTETICOS))
+    parser.add_argument('--diretorio-dados', default=DIRETORIO_DADOS)
+    parser.add_argument('--saida', default=ARQUIVO_RESULTADOS)
+    parser.add_argument('--baseline', default=ARQUIVO_BASELINE)
+    parser.add_argument('--salvar-baseline', action='store_true', help="grava os resultados desta execução como novo baseline")
+    parser.add_argument('--tolerancia', type=float, default=0.25, help="aumento relativo de tempo aceito antes de acusar regressão")
+    parser.add_argument('--sem-memoria', action='store_true', help="não mede o pico de memória (evita a segunda execução de cada etapa)")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    for tipo in args.fontes:
+        for n in args.tamanhos:
+            caminho = gerar_planilha(tipo, n, args.diretorio_dados)
+            etapas = medir_fonte(tipo, caminho, memoria=not args.sem_memoria)
+            resultados.setdefault(tipo, {})[str(n)] = etapas
+            for etapa, medida in etapas.items():
+                memoria = f"  pico {medida['pico_mb']:9.2f} MB" if 'pico_mb' in medida else ''
+                print(f"{tipo:15} {n:>9} {etapa:30} {medida['segundos']:10.4f} s{memoria}")
+
+    relatorio = {
+        'ambiente': {'data': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__, 'maquina': platform.node()},
+        'resultados': resultados,
+    }
+    with open(args.saida, 'w', encoding='utf-8') as f: json.dump(relatorio, f, indent=2, ensure_ascii=False)
+
+    regressoes = []
+    if os.path.exists(args.baseline) and not args.salvar_baseline:
+        with open(args.baseline, encoding='utf-8') as f: baseline = json.load(f)['resultados']
+        regressoes = comparar(resultados, baseline, args.tolerancia)
+        for tipo, n, etapa, atual, antes in regressoes:
+            print(f"REGRESSÃO {tipo} {n} {etapa}: {atual:.4f} s (baseline {antes:.4f} s, {atual / antes - 1:+.0%})")
+        if not regressoes: print(f"Sem regressões em relação a '{args.baseline}' (tolerância {args.tolerancia:.0%}).")
+    if args.salvar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f: json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"Baseline gravado em '{args.baseline}'.")
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
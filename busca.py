@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+from indices import SEM_POSICOES, IndiceHash
+from processamento import normalizar_id_item
+
+# --- Busca textual nos alertas ---
+# Os textos de 'ID_Item', 'Objeto' e 'Proponente' são normalizados (sem acento, sem caixa, espaços
+# simples) e reunidos num vocabulário de valores distintos; cada valor é quebrado em trigramas e o
+# índice invertido trigrama -> valores é montado uma vez por versão dos dados. Uma busca cruza as
+# listas dos trigramas do termo, confirma o trecho só nos valores candidatos e leva o resultado às
+# linhas pelos códigos de cada coluna, sem varrer as strings de todas as linhas.
+COLUNAS_BUSCA = ['ID_Item', 'Objeto', 'Proponente']
+TAMANHO_TRIGRAMA = 3
+
+
+def normalizar_texto(textos):
+    """`textos` (Index/Series de str) sem acentos, em minúsculas e com espaços simples: 'CONVÊNIO' -> 'convenio'."""
+    return (textos.str.normalize('NFKD').str.replace(r'[\u0300-\u036f]', '', regex=True)
+            .str.casefold().str.split().str.join(' '))
+
+
+def _codificar_trigramas(codigos):
+    """Um uint64 por trigrama (três code points de 21 bits) a partir dos code points do texto."""
+    return (codigos[:-2] << np.uint64(42)) | (codigos[1:-1] << np.uint64(21)) | codigos[2:]
+
+
+def _code_points(texto):
+    return np.frombuffer(texto.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+
+
+class IndiceBusca:
+    """Índice de trigramas sobre as colunas de busca de `df`; `buscar` devolve as posições das linhas.
+
+    Cada termo da consulta precisa aparecer (como trecho) em alguma das colunas; termos com menos de
+    três letras não têm trigrama e são conferidos direto no vocabulário, que é bem menor que as linhas.
+    """
+
+    def __init__(self, df, colunas=COLUNAS_BUSCA):
+        self.linhas = len(df)
+        normalizados, codigos_colunas = [], []
+        for coluna in [c for c in colunas if c in df.columns]:
+            serie = normalizar_id_item(df[coluna]) if coluna == 'ID_Item' else df[coluna]
+            codigos, unicos = pd.factorize(serie) # vazios recebem -1 e nunca casam
+            normalizados.append(normalizar_texto(pd.Index([str(v) for v in unicos], dtype=object)))
+            codigos_colunas.append(codigos)
+        # Vocabulário único entre as colunas: o mesmo texto em colunas diferentes é indexado uma vez.
+        todos = np.concatenate([n.to_numpy(dtype=object) for n in normalizados]) if normalizados else np.array([], dtype=object)
+        codigos_vocabulario, vocabulario = pd.factorize(todos)
+        self.vocabulario = np.asarray(vocabulario, dtype=object)
+        self._codigos, inicio = [], 0
+        for n, codigos in zip(normalizados, codigos_colunas):
+            mapa = codigos_vocabulario[inicio:inicio + len(n)]
+            self._codigos.append(np.where(codigos >= 0, mapa[np.maximum(codigos, 0)] if len(mapa) else -1, -1))
+            inicio += len(n)
+
+        # Trigramas de todo o vocabulário de uma vez: textos separados por '\0', trigramas que cruzam
+        # o separador descartados, pares (trigrama, valor) únicos; o `IndiceHash` agrupa os pares por trigrama.
+        tamanhos = np.fromiter((len(t) for t in self.vocabulario), dtype=np.int64, count=len(self.vocabulario))
+        pontos = _code_points('\0'.join(self.vocabulario) + '\0')
+        valor_de_posicao = np.repeat(np.arange(len(self.vocabulario)), tamanhos + 1)
+        trigramas = _codificar_trigramas(pontos)
+        validos = (pontos[:-2] != 0) & (pontos[1:-1] != 0) & (pontos[2:] != 0)
+        codigos_trigramas, chaves = pd.factorize(trigramas[validos])
+        base = max(len(self.vocabulario), 1)
+        pares = np.unique(codigos_trigramas.astype(np.int64) * base + valor_de_posicao[:-2][validos])
+        self._valores = pares % base
+        self.indice_trigramas = IndiceHash(chaves[pares // base]) # trigrama -> posições em `_valores`
+
+    def _candidatos(self, termo):
+        """Valores do vocabulário com todos os trigramas do termo (ordenados), ou `None` se o termo não tem trigrama."""
+        if len(termo) < TAMANHO_TRIGRAMA: return None
+        trigramas = np.unique(_codificar_trigramas(_code_points(termo)))
+        listas = sorted((self._valores[self.indice_trigramas.posicoes(t)] for t in trigramas), key=len) # trigrama ausente: lista vazia
+        candidatos = listas[0]
+        for lista in listas[1:]:
+            if not len(candidatos): break
+            candidatos = np.intersect1d(candidatos, lista, assume_unique=True)
+        return candidatos
+
+    def valores_com(self, termo):
+        """Máscara sobre o vocabulário dos valores que contêm `termo` (já normalizado)."""
+        candidatos = self._candidatos(termo)
+        if candidatos is None: candidatos = np.arange(len(self.vocabulario))
+        # Os trigramas não garantem a ordem nem a vizinhança ('abcxbcd' tem os de 'abcd'): confere o trecho.
+        confirmados = candidatos[np.fromiter((termo in t for t in self.vocabulario[candidatos]), dtype=bool, count=len(candidatos))]
+        mascara = np.zeros(len(self.vocabulario) + 1, dtype=bool) # última posição: código -1 (vazio)
+        mascara[confirmados] = True
+        return mascara
+
+    def buscar(self, consulta):
+        """Posições (ordenadas) das linhas em que cada termo de `consulta` aparece em alguma das colunas."""
+        termos = normalizar_texto(pd.Index([str(consulta)], dtype=object))[0].split()
+        if not termos: return np.arange(self.linhas)
+        encontradas = np.ones(self.linhas, dtype=bool)
+        for termo in dict.fromkeys(termos):
+            mascara = self.valores_com(termo)
+            encontradas &= np.logical_or.reduce([mascara[codigos] for codigos in self._codigos]) if self._codigos else False
+            if not encontradas.any(): return SEM_POSICOES
+        return np.flatnonzero(encontradas)
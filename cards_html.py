@@ -0,0 +1,123 @@
+"""HTML dos cards do painel (resumo e detalhe), sem dependência do Streamlit."""
+import numpy as np
+import pandas as pd
+
+from processamento import (
+    STATUS_PRAZO_ATRASADO, STATUS_PRAZO_PROXIMO, STATUS_PRAZO_ATENCAO, STATUS_PRAZO_OK,
+    STATUS_PRAZO_CONCLUIDO, STATUS_PRAZO_INDEFINIDO, STATUS_PRAZO_CONCLUIDO_INDEF,
+)
+
+# --- CSS e Funções dos Cards ---
+card_css = """<style> /* Seu CSS COMPLETO aqui - Omitido para brevidade */ 
+.flip-card { background-color: transparent; width: 100%; min-height: 140px; height: auto; perspective: 1000px; display: block; margin-bottom: 15px; }
+.flip-card-inner { position: relative; width: 100%; height: 100%; min-height: 140px; text-align: center; transition: transform 0.6s; transform-style: preserve-3d; box-shadow: 0 4px 8px 0 rgba(0,0,0,0.2); border-radius: 10px; }
+.flip-card:hover .flip-card-inner { transform: rotateY(180deg); }
+.flip-card-front, .flip-card-back { position: absolute; width: 100%; height: 100%; -webkit-backface-visibility: hidden; backface-visibility: hidden; border-radius: 10px; display: flex; flex-direction: column; justify-content: center; align-items: center; color: white; padding: 8px 12px; box-sizing: border-box; }
+.flip-card-back { transform: rotateY(180deg); display: flex; flex-direction: column; justify-content: center; align-items: center; }
+.card-atrasado .flip-card-front { background-color: #D32F2F; } .card-atrasado .flip-card-back  { background-color: #B71C1C; }
+.card-proximo .flip-card-front { background-color: #FFA000; } .card-proximo .flip-card-back  { background-color: #FF8F00; }
+.card-atencao .flip-card-front { background-color: #FBC02D; color: #333; } .card-atencao .flip-card-back  { background-color: #F9A825; color: #333; }
+.card-ok .flip-card-front { background-color: #388E3C; } .card-ok .flip-card-back { background-color: #1B5E20; }
+.card-concluido .flip-card-front { background-color: #607D8B; } .card-concluido .flip-card-back { background-color: #455A64; }
+.card-indefinido .flip-card-front { background-color: #757575; } .card-indefinido .flip-card-back { background-color: #424242; }
+.card-default .flip-card-front { background-color: #424242; } .card-default .flip-card-back { background-color: #212121; }
+.card-title-summary { font-size: 0.9em; font-weight: bold; margin-bottom: 5px; }
+.card-data-summary { font-size: 2.0em; font-weight: bold; }
+.flip-card-front .card-content-detail { font-size: 0.78em; text-align: left; width: 100%; line-height: 1.3; }
+.flip-card-front .card-content-detail strong { font-weight: bold; }
+.card-title-back { font-size: 0.9em; font-weight: bold; margin-bottom: 8px; }
+.card-data-money { font-size: 1.6em; font-weight: bold; }
+.cards-grid { display: grid; grid-template-columns: repeat(4, minmax(0, 1fr)); column-gap: 1rem; }
+</style>"""
+def create_flip_card_summary(front_title, front_data, back_title, back_data, card_type_class):
+    # (função igual)
+    if isinstance(back_data, (int, float, np.number)):
+        try: formatted_back_data = f'R$ {back_data:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+        except (ValueError, TypeError): formatted_back_data = str(back_data)
+    else: formatted_back_data = back_data
+    front_html_content = f"""<div class="card-title-summary">{front_title}</div><div class="card-data-summary">{front_data}</div>"""
+    back_html_content = f"""<div class="card-title-back">{back_title}</div><div class="card-data-money">{formatted_back_data}</div>"""
+    card_html = f"""<div class="flip-card {card_type_class}"><div class="flip-card-inner"><div class="flip-card-front">{front_html_content}</div><div class="flip-card-back">{back_html_content}</div></div></div>"""
+    return card_html
+def create_flip_card_detalhe(id_item, processo_ou_objeto, proponente, data_vigencia, valor, card_type_class):
+    """Card de detalhe de um item. O painel usa `gerar_html_cards`, que produz o mesmo HTML em bloco;
+    esta versão linha a linha fica como referência no benchmark."""
+    data_str = data_vigencia.strftime('%d/%m/%Y') if pd.notnull(data_vigencia) else "Indefinida"
+    if isinstance(valor, (int, float, np.number)):
+        try: formatted_valor = f'R$ {valor:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+        except (ValueError, TypeError): formatted_valor = str(valor)
+    else: formatted_valor = str(valor) if pd.notnull(valor) else "N/A"
+    id_item_str = str(id_item) if pd.notnull(id_item) else "N/A"
+    processo_ou_objeto_str = str(processo_ou_objeto) if pd.notnull(processo_ou_objeto) else "N/A"
+    proponente_str = str(proponente) if pd.notnull(proponente) else "N/A"
+    processo_disp = (processo_ou_objeto_str[:40] + '...') if len(processo_ou_objeto_str) > 43 else processo_ou_objeto_str
+    proponente_disp = (proponente_str[:40] + '...') if len(proponente_str) > 43 else proponente_str
+    front_html_content = f"""<div class='card-content-detail'><strong>Item:</strong> {id_item_str}<br><strong>Processo/Obj.:</strong> {processo_disp}<br><strong>Proponente:</strong> {proponente_disp}<br><strong>Vigência:</strong> {data_str}</div>"""
+    back_html_content = f"""<div class="card-title-back">Valor</div><div class="card-data-money">{formatted_valor}</div>"""
+    card_html = f"""<div class="flip-card {card_type_class}"><div class="flip-card-inner"><div class="flip-card-front">{front_html_content}</div><div class="flip-card-back">{back_html_content}</div></div></div>"""
+    return card_html
+
+# --- Grade de cards gerada em bloco ---
+CLASSES_CARD_STATUS_PRAZO = {
+    STATUS_PRAZO_ATRASADO: "card-atrasado", STATUS_PRAZO_PROXIMO: "card-proximo", STATUS_PRAZO_ATENCAO: "card-atencao",
+    STATUS_PRAZO_CONCLUIDO: "card-concluido", STATUS_PRAZO_OK: "card-ok", STATUS_PRAZO_INDEFINIDO: "card-indefinido",
+    STATUS_PRAZO_CONCLUIDO_INDEF: "card-concluido",
+}
+TRADUCAO_MOEDA_BR = str.maketrans({',': '.', '.': ','})
+DIGITOS_REAIS = 14 # até 2**53 centavos o float ainda guarda o centavo exato
+
+def formatar_moeda_serie(valores):
+    """Formata uma Series numérica como 'R$ 1.234,56' (mesmo texto de `create_flip_card_detalhe`).
+
+    Reais e centavos saem como inteiros do NumPy e os caracteres são montados numa matriz (uma linha por
+    valor, escrita do fim para o começo) que vira str de uma vez. NaN/inf, valores enormes e os quase
+    exatamente no meio centavo (onde o `round` do float e o do `format` podem divergir) vão pelo `format`.
+    """
+    v = valores.to_numpy(dtype='float64', na_value=np.nan)
+    with np.errstate(invalid='ignore'):
+        centesimos = np.abs(v) * 100
+        especial = ~(centesimos < 2 ** 53) | (np.abs(centesimos - np.floor(centesimos) - 0.5) <= 2 * np.spacing(centesimos))
+    centavos = np.round(np.where(especial, 0, centesimos)).astype(np.int64)
+    reais, k = centavos // 100, np.arange(DIGITOS_REAIS)
+    qtd = np.maximum(1, (reais[:, None] >= 10 ** k).sum(axis=1)) # dígitos dos reais
+    # Coluna 0 = último centavo; o dígito k dos reais vai na coluna 3 + k + k // 3 (pontos de milhar entre eles).
+    largura = 3 + DIGITOS_REAIS + (DIGITOS_REAIS - 1) // 3 + 1
+    m = np.zeros((len(v), largura), dtype=np.uint32)
+    m[:, 0], m[:, 1], m[:, 2] = ord('0') + centavos % 10, ord('0') + centavos // 10 % 10, ord(',')
+    m[:, 3 + k + k // 3] = ord('0') + reais[:, None] // 10 ** k % 10
+    pontos = k[2:-1:3]
+    m[:, 4 + pontos + pontos // 3] = ord('.')
+    tamanho = 3 + qtd + (qtd - 1) // 3
+    m[np.arange(len(v)), tamanho] = ord('-')
+    tamanho = tamanho + (np.signbit(v) & ~especial) # '-0,00' como no format
+    # Desespelha cada linha alinhando à esquerda; o que passa do tamanho fica '\0', que o NumPy descarta na str.
+    origem = tamanho[:, None] - 1 - np.arange(largura)
+    numero = np.where(origem >= 0, np.take_along_axis(m, np.maximum(origem, 0), axis=1), 0)
+    textos = np.ascontiguousarray(numero).view(f'U{largura}').ravel().astype(object)
+    texto = 'R$ ' + pd.Series(textos, index=valores.index, name=valores.name, dtype=object)
+    if especial.any(): texto[especial] = ('R$ ' + valores[especial].map('{:,.2f}'.format)).str.translate(TRADUCAO_MOEDA_BR)
+    return texto
+
+def _texto_card(serie, limite=43):
+    texto = serie.astype(str).where(serie.notna(), "N/A")
+    return texto.where(texto.str.len() <= limite, texto.str[:limite - 3] + '...')
+
+def gerar_html_cards(df, id_col='ID_Item', objeto_col='Objeto', proponente_col='Proponente'):
+    """HTML da grade de cards de detalhe para todas as linhas de `df`, montado com operações de coluna."""
+    if df.empty: return '<div class="cards-grid"></div>'
+    classes = df['Status Prazo'].astype(object).map(CLASSES_CARD_STATUS_PRAZO).fillna("card-default")
+    datas = df['Data Pagamento'].dt.strftime('%d/%m/%Y').fillna("Indefinida")
+    valores = formatar_moeda_serie(df['Valor_Calculo'])
+    ids = df[id_col].astype(str).where(df[id_col].notna(), "N/A")
+    cards = ('<div class="flip-card ' + classes + '"><div class="flip-card-inner"><div class="flip-card-front">'
+             + "<div class='card-content-detail'><strong>Item:</strong> " + ids
+             + '<br><strong>Processo/Obj.:</strong> ' + _texto_card(df[objeto_col])
+             + '<br><strong>Proponente:</strong> ' + _texto_card(df[proponente_col])
+             + '<br><strong>Vigência:</strong> ' + datas
+             + '</div></div><div class="flip-card-back"><div class="card-title-back">Valor</div><div class="card-data-money">' + valores
+             + '</div></div></div></div>')
+    return '<div class="cards-grid">' + ''.join(cards.tolist()) + '</div>'
+
+def ordenar_para_cards(df):
+    """Ordem de exibição dos cards: por status de prazo, depois mais atrasados e mais próximos primeiro."""
+    return df.sort_values(by=['Status Prazo', 'Dias Atraso', 'Dias Restantes'], ascending=[True, False, True])
@@ -0,0 +1,347 @@
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from atualizacao import colunas_planilha, comparar_versoes, hash_linhas, hashes_de_contexto, processar_delta
+from instrumentacao import incorporar, iniciar_coleta, medir
+
+# --- Cache das planilhas processadas ---
+# Vive fora do script principal porque o Streamlit reexecuta o app a cada interação,
+# mas mantém os módulos importados em memória: o cache sobrevive entre as reexecuções.
+
+
+def calcular_hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    h = hashlib.sha256()
+    with medir('hash_arquivo', arquivo=os.path.basename(caminho)), open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+MAX_ARTEFATOS_POR_DATASET = 16
+MAX_MUDANCAS_REGISTRADAS = 50
+
+
+class CachePlanilhas:
+    """Guarda o DataFrame processado de cada planilha até o arquivo mudar.
+
+    A validade é conferida primeiro por mtime e tamanho (um `os.stat`, barato); se algum
+    dos dois mudou, o hash do conteúdo decide se é preciso ler e processar de novo.
+    Os DataFrames devolvidos são compartilhados entre reexecuções e não devem ser alterados.
+    Quando uma planilha já carregada muda, só as linhas novas ou alteradas são reprocessadas
+    (`atualizacao.processar_delta`) e o resumo da mudança vai para `mudancas`.
+    """
+
+    def __init__(self):
+        self._entradas = {}
+        self._combinados = {}
+        self._artefatos = {}
+        self._lock = threading.Lock()
+        self.mudancas = deque(maxlen=MAX_MUDANCAS_REGISTRADAS) # mais recente por último
+        self.acertos = 0
+        self.falhas = 0
+
+    def carregar(self, caminho, processador):
+        """Devolve `(df, erro)` como os `processar_dados_df_*`, lendo o arquivo só se mudou."""
+        chave = (os.path.abspath(caminho), processador.__name__)
+        try: entrada, stat, hash_conteudo = self._consultar(caminho, chave)
+        except FileNotFoundError: return pd.DataFrame(), f"Arquivo '{caminho}' não encontrado."
+        if entrada is not None: return entrada['df'], entrada['erro']
+        anterior = self._versao_anterior(chave)
+        df, erro = carregar_com_snapshot(caminho, processador, hash_conteudo, anterior and anterior['df'])
+        self._guardar(chave, stat, hash_conteudo, df, erro)
+        return df, erro
+
+    def carregar_varios(self, fonte, processador, max_processos=None):
+        """Como `carregar`, mas `fonte` pode ser um diretório ou um padrão glob com várias planilhas.
+
+        As planilhas que não estão no cache são lidas em paralelo num pool de processos (o openpyxl
+        é CPU-bound e segura o GIL) e os resultados válidos são concatenados, com a coluna
+        'Arquivo_Origem'. Os erros de cada arquivo são reunidos numa única mensagem.
+        """
+        arquivos = listar_planilhas(fonte)
+        if arquivos == [fonte]: return self.carregar(fonte, processador)
+        if not arquivos: return pd.DataFrame(), f"Nenhuma planilha encontrada em '{fonte}'."
+
+        resultados, pendentes = {}, []
+        for caminho in arquivos:
+            chave = (os.path.abspath(caminho), processador.__name__)
+            try: entrada, stat, hash_conteudo = self._consultar(caminho, chave)
+            except FileNotFoundError: resultados[caminho] = (pd.DataFrame(), f"Arquivo '{caminho}' não encontrado."); continue
+            if entrada is not None: resultados[caminho] = (entrada['df'], entrada['erro'])
+            elif self._versao_anterior(chave) is not None:
+                # Planilha alterada: o delta reaproveita a versão anterior, que está neste processo.
+                df, erro = carregar_com_snapshot(caminho, processador, hash_conteudo, self._versao_anterior(chave)['df'])
+                self._guardar(chave, stat, hash_conteudo, df, erro)
+                resultados[caminho] = (df, erro)
+            else: pendentes.append((caminho, chave, stat, hash_conteudo))
+        lidos = processar_em_paralelo([(caminho, processador, hash_conteudo) for caminho, _, _, hash_conteudo in pendentes], max_processos)
+        for (caminho, chave, stat, hash_conteudo), (df, erro) in zip(pendentes, lidos):
+            self._guardar(chave, stat, hash_conteudo, df, erro)
+            resultados[caminho] = (df, erro)
+
+        partes = [(caminho, df) for caminho, (df, erro) in resultados.items() if not erro and not df.empty]
+        erro = "\n".join(f"{os.path.basename(caminho)}: {erro}" for caminho, (_, erro) in resultados.items() if erro) or None
+        chave_fonte = ('varios', os.path.abspath(fonte), processador.__name__)
+        with self._lock:
+            combinado = self._combinados.get(chave_fonte)
+            if combinado is not None and len(combinado['partes']) == len(partes) and all(a is b for a, (_, b) in zip(combinado['partes'], partes)):
+                return combinado['df'], erro # mesmas versões de todos os arquivos: mesmo DataFrame (e artefatos)
+        df = concatenar_planilhas(partes)
+        with self._lock: self._combinados[chave_fonte] = {'partes': [df_parte for _, df_parte in partes], 'df': df}
+        return df, erro
+
+    def _consultar(self, caminho, chave):
+        """Devolve `(entrada, stat, hash)`: a entrada válida do cache ou `None` se é preciso ler de novo."""
+        stat = os.stat(caminho)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and (entrada['mtime'], entrada['tamanho']) == (stat.st_mtime_ns, stat.st_size):
+                self.acertos += 1
+                return entrada, stat, entrada['hash']
+
+        hash_conteudo = calcular_hash_arquivo(caminho)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada['hash'] == hash_conteudo:
+                # Arquivo regravado sem mudança de conteúdo: só atualiza a impressão digital.
+                entrada['mtime'], entrada['tamanho'] = stat.st_mtime_ns, stat.st_size
+                self.acertos += 1
+                return entrada, stat, hash_conteudo
+        return None, stat, hash_conteudo
+
+    def _versao_anterior(self, chave):
+        """Entrada já carregada (e válida) da planilha, base para o delta quando ela muda."""
+        with self._lock: entrada = self._entradas.get(chave)
+        return entrada if entrada is not None and not entrada['erro'] and not entrada['df'].empty else None
+
+    def _guardar(self, chave, stat, hash_conteudo, df, erro):
+        anterior = self._versao_anterior(chave)
+        with self._lock:
+            self.falhas += 1
+            self._entradas[chave] = {'mtime': stat.st_mtime_ns, 'tamanho': stat.st_size, 'hash': hash_conteudo, 'df': df, 'erro': erro, 'data': date.today()}
+        if anterior is not None and anterior['hash'] != hash_conteudo and not erro and not df.empty: self._registrar_mudanca(chave[0], anterior, df)
+
+    def _registrar_mudanca(self, caminho, anterior, df):
+        colunas = {'ID_Item', 'Proponente', 'Data Pagamento', 'Status'}
+        if not colunas <= set(anterior['df'].columns) or not colunas <= set(df.columns): return
+        with medir('comparar_versoes', arquivo=os.path.basename(caminho)):
+            mudanca = comparar_versoes(anterior['df'], df, anterior['data'], date.today())
+        mudanca.update({'momento': datetime.now(), 'arquivo': os.path.basename(caminho)})
+        with self._lock: self.mudancas.append(mudanca)
+
+    def artefato(self, df, nome, construtor):
+        """Estrutura derivada de `df` (índices, agregados...), construída uma vez por versão do dataset.
+
+        Como o cache devolve sempre o mesmo objeto enquanto a planilha não muda, a identidade
+        do DataFrame identifica a versão; quando ele é descartado, os artefatos vão junto.
+        `nome` pode ser qualquer chave hashable (ex.: `('prazos', data)`); cada DataFrame guarda
+        no máximo `MAX_ARTEFATOS_POR_DATASET`, descartando os usados há mais tempo.
+        `df` também pode ser uma tupla de DataFrames (ex.: a visão consolidada das fontes): o artefato
+        vale para essa combinação de versões e é descartado quando qualquer um deles for.
+        """
+        dfs = df if isinstance(df, tuple) else (df,)
+        chave = tuple(map(id, dfs)) if isinstance(df, tuple) else id(df)
+        with self._lock:
+            artefatos = self._artefatos.get(chave)
+            if artefatos is None:
+                artefatos = self._artefatos[chave] = OrderedDict()
+                for d in dfs: weakref.finalize(d, self._artefatos.pop, chave, None)
+            if nome in artefatos:
+                artefatos.move_to_end(nome)
+                return artefatos[nome]
+        valor = construtor(df)
+        with self._lock:
+            artefatos[nome] = valor
+            while len(artefatos) > MAX_ARTEFATOS_POR_DATASET: artefatos.popitem(last=False)
+        return valor
+
+    def estatisticas(self):
+        return {'acertos': self.acertos, 'falhas': self.falhas, 'entradas': len(self._entradas)}
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._combinados.clear()
+            self._artefatos.clear()
+            self.mudancas.clear()
+            self.acertos, self.falhas = 0, 0
+
+
+def ler_e_processar(caminho, processador, anterior=None):
+    """Lê a planilha e devolve `(df, erro)` com o DataFrame processado e a coluna 'Hash_Linha'.
+
+    Com `anterior` (versão processada da mesma planilha), só as linhas novas ou alteradas passam pelo
+    processador. A leitura do .xlsx continua sendo do arquivo inteiro: o formato não permite ler só
+    algumas linhas.
+    """
+    arquivo = os.path.basename(caminho)
+    try:
+        with medir('read_excel', memoria_profunda=True, arquivo=arquivo) as registro: registro['df'] = df_raw = pd.read_excel(caminho)
+    except FileNotFoundError: return pd.DataFrame(), f"Arquivo '{caminho}' não encontrado."
+    except Exception as e: return pd.DataFrame(), f"Erro ao ler '{caminho}': {e}"
+    if df_raw is None: return pd.DataFrame(), f"Falha leitura '{caminho}'."
+    if df_raw.empty: return pd.DataFrame(), f"Arquivo '{caminho}' vazio."
+    with medir('hash_linhas', arquivo=arquivo): hashes = hash_linhas(df_raw)
+    delta = None
+    if anterior is not None:
+        try:
+            with medir('processar_delta', memoria_profunda=True, arquivo=arquivo) as registro:
+                delta = processar_delta(df_raw, hashes, anterior, processador)
+                if delta is not None: registro['df'], registro['linhas_processadas'] = delta
+        except Exception: delta = None # o processamento completo abaixo reporta o erro
+    if delta is not None: df, erro = delta[0], None
+    else:
+        try:
+            with medir(processador.__name__, memoria_profunda=True, arquivo=arquivo) as registro:
+                df, erro = processador(df_raw)
+                if df is not None: registro['df'] = df
+        except Exception as e: return pd.DataFrame(), f"Erro ao processar '{caminho}': {e}"
+    if df is None: return pd.DataFrame(), erro
+    if not erro and len(df) == len(df_raw): # processadores que não descartam linhas: habilita o delta
+        df['Hash_Linha'] = hashes
+        df.attrs['colunas_planilha'] = colunas_planilha(df_raw)
+        df.attrs['hashes_contexto'] = hashes_de_contexto(df_raw, hashes)
+    return df, erro
+
+
+# --- Snapshots colunares (Parquet) ---
+# Na primeira leitura de uma planilha o resultado processado é gravado em Parquet, já tipado.
+# Nas execuções seguintes o snapshot é lido por memory-map e o openpyxl só volta a ser usado
+# quando a impressão digital (hash do .xlsx e processador) muda. Os processadores usados aqui produzem
+# só a camada base (`processamento.preparar_base`), que não depende do dia.
+DIRETORIO_SNAPSHOTS = '.snapshots'
+VERSAO_SNAPSHOT = '6'
+COLUNAS_CATEGORICAS = ['Status', 'Status Prazo']
+
+
+def caminho_snapshot(caminho, processador):
+    pasta = os.path.join(os.path.dirname(os.path.abspath(caminho)), DIRETORIO_SNAPSHOTS)
+    return os.path.join(pasta, f"{os.path.basename(caminho)}.{processador.__name__}.parquet")
+
+
+def impressao_digital(hash_conteudo, processador):
+    return {'versao': VERSAO_SNAPSHOT, 'hash': hash_conteudo, 'processador': processador.__name__}
+
+
+def tipar_dataframe(df):
+    """Fixa os tipos do DataFrame processado: datas em datetime64, valores em float64 e status em categoria."""
+    df = df.copy()
+    if 'Data Pagamento' in df.columns: df['Data Pagamento'] = pd.to_datetime(df['Data Pagamento'], errors='coerce')
+    if 'Valor_Calculo' in df.columns: df['Valor_Calculo'] = df['Valor_Calculo'].astype('float64')
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns: df[col] = df[col].astype('category')
+    # Colunas de texto com tipos misturados (ex.: números de convênio lidos como int e str) não cabem
+    # numa coluna Arrow; passam a texto, mantendo os vazios.
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True) not in ('string', 'empty'):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def ler_snapshot(caminho_pq, digital):
+    try:
+        metadados = pq.read_schema(caminho_pq).metadata or {}
+    except (FileNotFoundError, pa.ArrowInvalid, OSError):
+        return None
+    if any(metadados.get(f'alertas.{k}'.encode()) != v.encode() for k, v in digital.items()):
+        return None
+    try:
+        with medir('ler_snapshot', memoria_profunda=True, arquivo=os.path.basename(caminho_pq)) as registro:
+            registro['df'] = df = pq.read_table(caminho_pq, memory_map=True).to_pandas()
+    except (pa.ArrowInvalid, OSError):
+        return None
+    df.attrs.update(json.loads(metadados.get(b'alertas.attrs', b'{}')))
+    return df
+
+
+def gravar_snapshot(caminho_pq, df, digital):
+    try:
+        with medir('gravar_snapshot', memoria_profunda=True, arquivo=os.path.basename(caminho_pq)) as registro:
+            registro['df'] = df
+            os.makedirs(os.path.dirname(caminho_pq), exist_ok=True)
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            metadados = dict(tabela.schema.metadata or {})
+            metadados.update({f'alertas.{k}'.encode(): v.encode() for k, v in digital.items()})
+            metadados[b'alertas.attrs'] = json.dumps(df.attrs).encode() # ex.: valores_coagidos
+            caminho_tmp = caminho_pq + '.tmp'
+            pq.write_table(tabela.replace_schema_metadata(metadados), caminho_tmp)
+            os.replace(caminho_tmp, caminho_pq)
+    except (pa.ArrowException, OSError):
+        # Snapshot é só um atalho: se não der para gravar, a próxima carga volta ao .xlsx.
+        pass
+
+
+def carregar_com_snapshot(caminho, processador, hash_conteudo=None, anterior=None):
+    """Como `ler_e_processar`, mas passando pelo snapshot Parquet da planilha."""
+    if hash_conteudo is None:
+        try: hash_conteudo = calcular_hash_arquivo(caminho)
+        except FileNotFoundError: return pd.DataFrame(), f"Arquivo '{caminho}' não encontrado."
+    digital = impressao_digital(hash_conteudo, processador)
+    caminho_pq = caminho_snapshot(caminho, processador)
+    df = ler_snapshot(caminho_pq, digital)
+    if df is not None: return df, None
+    df, erro = ler_e_processar(caminho, processador, anterior)
+    if erro or df.empty: return df, erro
+    df = tipar_dataframe(df)
+    gravar_snapshot(caminho_pq, df, digital)
+    return df, None
+
+
+# --- Várias planilhas por fonte ---
+def listar_planilhas(fonte):
+    """Planilhas de uma fonte: o próprio arquivo, os .xlsx de um diretório ou os que casam com um glob."""
+    if os.path.isdir(fonte): arquivos = glob.glob(os.path.join(fonte, '*.xlsx'))
+    elif glob.has_magic(fonte): arquivos = glob.glob(fonte)
+    else: return [fonte]
+    return sorted(a for a in arquivos if not os.path.basename(a).startswith('~$')) # ignora arquivos de trava do Excel
+
+
+def _carregar_no_processo(caminho, processador, hash_conteudo):
+    registros = iniciar_coleta()
+    return carregar_com_snapshot(caminho, processador, hash_conteudo), registros
+
+
+def processar_em_paralelo(tarefas, max_processos=None):
+    """Executa `carregar_com_snapshot(*tarefa)` para cada tarefa, em processos separados quando há mais de uma.
+
+    As medições feitas nos processos filhos voltam junto com o resultado e entram na coleta deste processo.
+    """
+    max_processos = min(len(tarefas), max_processos or os.cpu_count() or 1)
+    if max_processos <= 1: return [carregar_com_snapshot(*tarefa) for tarefa in tarefas]
+    try:
+        # 'spawn' porque o servidor do Streamlit tem várias threads, e fork com threads vivas pode travar.
+        with ProcessPoolExecutor(max_workers=max_processos, mp_context=multiprocessing.get_context('spawn')) as pool:
+            resultados = list(pool.map(_carregar_no_processo, *zip(*tarefas)))
+    except (BrokenProcessPool, OSError):
+        return [carregar_com_snapshot(*tarefa) for tarefa in tarefas]
+    for _, registros in resultados: incorporar(registros)
+    return [resultado for resultado, _ in resultados]
+
+
+def concatenar_planilhas(partes):
+    """Junta os DataFrames processados `[(caminho, df), ...]` de uma mesma fonte."""
+    if not partes: return pd.DataFrame()
+    with medir('concatenar_planilhas', memoria_profunda=True, arquivos=len(partes)) as registro:
+        df = pd.concat([parte.assign(Arquivo_Origem=os.path.basename(caminho)) for caminho, parte in partes], ignore_index=True)
+        df = tipar_dataframe(df) # categorias diferentes entre arquivos viram object no concat
+        df.attrs = dict(partes[0][1].attrs) # o concat só preserva attrs idênticos
+        df.attrs['valores_coagidos'] = sum(parte.attrs.get('valores_coagidos', 0) for _, parte in partes)
+        registro['df'] = df
+    return df
+
+
+# Instância única usada pelo app (compartilhada entre sessões e reexecuções).
+CACHE_PLANILHAS = CachePlanilhas()
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from indices import IndiceHash
+from processamento import ROTULOS_STATUS_PRAZO, STATUS_PRAZO_ATRASADO, STATUS_PRAZO_CONCLUIDO, STATUS_PRAZO_CONCLUIDO_INDEF, normalizar_id_item
+
+# --- Visão consolidada das fontes ---
+# Os três processadores levam as planilhas ao mesmo esquema interno; aqui elas são empilhadas com a
+# coluna 'Fonte' e indexadas uma vez por versão dos dados, para que as consultas do painel
+# (itens de um proponente, de um ID, vencimentos numa janela de dias) não varram todas as linhas.
+COLUNAS_CONSOLIDADO = ['Fonte', 'ID_Item', 'Objeto', 'Proponente', 'Status', 'Data Pagamento', 'Dias Restantes', 'Dias Atraso', 'Status Prazo', 'Valor_Calculo']
+STATUS_PRAZO_ENCERRADOS = [STATUS_PRAZO_CONCLUIDO, STATUS_PRAZO_CONCLUIDO_INDEF]
+
+
+def normalizar_proponente(serie):
+    """Chave de comparação dos proponentes: sem diferença de caixa nem de espaços repetidos."""
+    codigos, unicos = pd.factorize(serie.astype(str)) # poucos proponentes distintos: normaliza cada um uma vez
+    chaves = pd.Index(unicos).str.split().str.join(' ').str.casefold()
+    return pd.Series(chaves.take(codigos), index=serie.index, name=serie.name)
+
+
+def consolidar(fontes):
+    """Empilha `{fonte: df}` (camada de prazos de cada fonte) nas colunas internas comuns, com 'Fonte'."""
+    partes = [df.reindex(columns=COLUNAS_CONSOLIDADO[1:]).assign(Fonte=fonte) for fonte, df in fontes.items() if not df.empty]
+    if not partes: return pd.DataFrame(columns=COLUNAS_CONSOLIDADO)
+    df = pd.concat(partes, ignore_index=True)[COLUNAS_CONSOLIDADO]
+    df['Fonte'] = pd.Categorical(df['Fonte'], categories=list(fontes))
+    df['ID_Item'] = normalizar_id_item(df['ID_Item']) # números e textos entre fontes
+    df['Status'] = df['Status'].astype(str).astype('category') # categorias diferentes entre fontes viram object no concat
+    df['Status Prazo'] = pd.Categorical(df['Status Prazo'].astype(str), categories=sorted(ROTULOS_STATUS_PRAZO.values()))
+    df['Dias Restantes'] = df['Dias Restantes'].astype('float64')
+    return df
+
+
+class IndiceConsolidado:
+    """Índices sobre o DataFrame consolidado, construídos uma vez e consultados a cada interação.
+
+    - `ID_Item` e `Proponente` (normalizado): `IndiceHash` chave -> posições das linhas;
+    - prazos em aberto: dias com sinal (negativo = atrasado) ordenados, com o valor acumulado na
+      mesma ordem, de modo que o total de uma janela de dias sai de duas buscas binárias.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.indice_id = IndiceHash(df['ID_Item'])
+        chaves = normalizar_proponente(df['Proponente'])
+        self.indice_proponente = IndiceHash(chaves)
+
+        dias = (df['Dias Restantes'] - df['Dias Atraso']).to_numpy(dtype='float64', na_value=np.nan)
+        em_aberto = ~np.isnan(dias) & ~df['Status Prazo'].isin(STATUS_PRAZO_ENCERRADOS).to_numpy()
+        posicoes = np.flatnonzero(em_aberto)
+        self._ordem_prazos = posicoes[np.argsort(dias[posicoes], kind='stable')]
+        self._dias_ordenados = dias[self._ordem_prazos]
+        valores = df['Valor_Calculo'].fillna(0).to_numpy(dtype='float64')
+        self._valor_acumulado = np.concatenate(([0.0], np.cumsum(valores[self._ordem_prazos])))
+
+        atrasado = (df['Status Prazo'] == STATUS_PRAZO_ATRASADO).to_numpy()
+        self.exposicao = pd.DataFrame({
+            'chave': chaves, 'Proponente': df['Proponente'], 'Fonte': df['Fonte'], 'ID_Item': df['ID_Item'], 'Valor_Calculo': valores,
+            'itens_atrasados': atrasado & df['ID_Item'].notna().to_numpy(), 'valor_atrasado': np.where(atrasado, valores, 0.0),
+        }).groupby('chave', sort=False).agg(
+            Proponente=('Proponente', 'first'), fontes=('Fonte', 'nunique'), itens=('ID_Item', 'count'), valor_total=('Valor_Calculo', 'sum'),
+            itens_atrasados=('itens_atrasados', 'sum'), valor_atrasado=('valor_atrasado', 'sum'),
+        ).sort_values(['valor_atrasado', 'valor_total'], ascending=False)
+        self.resumo_fontes = df.groupby(['Fonte', 'Status Prazo'], observed=True).agg(
+            itens=('ID_Item', 'count'), valor=('Valor_Calculo', 'sum')).reset_index()
+
+    def itens_por_id(self, id_item):
+        return self.df.iloc[self.indice_id.posicoes(normalizar_id_item(pd.Series([id_item])).iat[0])]
+
+    def itens_por_proponente(self, proponente, status_prazo=None):
+        """Linhas do proponente (nome em qualquer caixa/espaçamento), opcionalmente só com esses 'Status Prazo'."""
+        chave = normalizar_proponente(pd.Series([proponente])).iat[0]
+        itens = self.df.iloc[self.indice_proponente.posicoes(chave)]
+        return itens[itens['Status Prazo'].isin(status_prazo)] if status_prazo else itens
+
+    def _faixa(self, dias_min, dias_max):
+        return np.searchsorted(self._dias_ordenados, dias_min, 'left'), np.searchsorted(self._dias_ordenados, dias_max, 'right')
+
+    def vencendo(self, dias_max, dias_min=0):
+        """Itens em aberto que vencem entre `dias_min` e `dias_max` dias (inclusive), do mais urgente ao menos."""
+        inicio, fim = self._faixa(dias_min, dias_max)
+        return self.df.iloc[self._ordem_prazos[inicio:fim]]
+
+    def valor_vencendo(self, dias_max, dias_min=0):
+        """`(quantidade, valor total)` dos itens em aberto que vencem entre `dias_min` e `dias_max` dias."""
+        inicio, fim = self._faixa(dias_min, dias_max)
+        return int(fim - inicio), float(self._valor_acumulado[fim] - self._valor_acumulado[inicio])
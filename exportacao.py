@@ -0,0 +1,104 @@
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+from openpyxl import Workbook
+
+from instrumentacao import medir
+
+# --- Exportação dos alertas filtrados ---
+# O arquivo é escrito em blocos de linhas num buffer que passa da memória para o disco acima de
+# LIMITE_MEMORIA_EXPORTACAO (SpooledTemporaryFile); o XLSX usa o modo write-only do openpyxl, que
+# também não monta a planilha inteira em memória. Só o arquivo pronto vai para a memória, porque é
+# assim que o `st.download_button` o entrega, e ele fica num LRU pequeno para downloads repetidos.
+COLUNAS_EXPORTACAO = ['ID_Item', 'Objeto', 'Proponente', 'Status', 'Data Pagamento', 'Dias Restantes', 'Dias Atraso', 'Status Prazo', 'Valor_Calculo']
+TITULOS_EXPORTACAO = {'ID_Item': 'Item', 'Objeto': 'Processo/Objeto', 'Data Pagamento': 'Data Vigência', 'Valor_Calculo': 'Valor'}
+LINHAS_POR_BLOCO = 20_000
+LIMITE_MEMORIA_EXPORTACAO = 8 * 1024 * 1024
+FORMATOS_EXPORTACAO = {
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'csv': ('text/csv', 'csv'),
+}
+
+
+def _blocos(df, linhas_por_bloco):
+    for inicio in range(0, len(df), linhas_por_bloco): yield df.iloc[inicio:inicio + linhas_por_bloco]
+
+
+def escrever_csv(df, destino, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """CSV no padrão do Excel em português (';' e vírgula decimal, UTF-8 com BOM), bloco a bloco."""
+    destino.write('\ufeff'.encode('utf-8'))
+    if df.empty: destino.write(';'.join(df.columns).encode('utf-8') + b'\r\n')
+    for numero, bloco in enumerate(_blocos(df, linhas_por_bloco)):
+        destino.write(bloco.to_csv(sep=';', decimal=',', index=False, header=numero == 0, date_format='%d/%m/%Y', lineterminator='\r\n').encode('utf-8'))
+
+
+def escrever_xlsx(df, destino, resumo=None, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """XLSX com a aba 'Alertas' (linhas de `df`) e, se houver, a aba 'Resumo' (`resumo`)."""
+    wb = Workbook(write_only=True)
+    abas = [('Alertas', df)] + ([('Resumo', resumo)] if resumo is not None else [])
+    for nome, dados in abas:
+        ws = wb.create_sheet(nome)
+        ws.append(list(dados.columns))
+        for bloco in _blocos(dados, linhas_por_bloco):
+            bloco = bloco.astype(object).where(bloco.notna(), None) # NaN/NaT viram célula vazia
+            for linha in bloco.itertuples(index=False, name=None): ws.append(linha)
+    wb.save(destino)
+
+
+def exportar_alertas(df, formato, resumo=None):
+    """Bytes do arquivo `formato` ('xlsx' ou 'csv') com as colunas de exportação de `df`."""
+    dados = df[[c for c in COLUNAS_EXPORTACAO if c in df.columns]]
+    dados = dados.astype({c: 'Int64' for c in ['Dias Restantes', 'Dias Atraso'] if c in dados.columns}).rename(columns=TITULOS_EXPORTACAO) # '12' e não '12,0'
+    with medir(f'exportar_{formato}', linhas=len(dados)), tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA_EXPORTACAO) as buffer:
+        if formato == 'xlsx': escrever_xlsx(dados, buffer, resumo)
+        else: escrever_csv(dados, buffer)
+        buffer.seek(0)
+        return buffer.read()
+
+
+def resumo_por_status_prazo(resumo_prazos):
+    """Aba de resumo a partir de `{status_prazo: (linhas, itens, valor)}` (o índice agregado do painel)."""
+    return pd.DataFrame([(prazo, linhas, itens, valor) for prazo, (linhas, itens, valor) in sorted(resumo_prazos.items())],
+                        columns=['Status Prazo', 'Linhas', 'Itens', 'Valor'])
+
+
+class CacheExportacoes:
+    """LRU dos arquivos exportados, limitado em quantidade e em bytes.
+
+    A chave inclui a identidade do DataFrame exportado (como em `CachePlanilhas.artefato`): quando
+    ele é descartado, os arquivos gerados a partir dele saem do cache.
+    """
+
+    def __init__(self, max_arquivos=8, max_bytes=64 * 1024 * 1024):
+        self.max_arquivos, self.max_bytes = max_arquivos, max_bytes
+        self._arquivos = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obter(self, df, chave):
+        with self._lock:
+            conteudo = self._arquivos.get((id(df), chave))
+            if conteudo is not None: self._arquivos.move_to_end((id(df), chave))
+            return conteudo
+
+    def guardar(self, df, chave, conteudo):
+        if len(conteudo) > self.max_bytes: return # maior que o cache inteiro: entrega sem guardar
+        with self._lock:
+            if (id(df), chave) in self._arquivos: self._bytes -= len(self._arquivos[(id(df), chave)])
+            elif not any(c[0] == id(df) for c in self._arquivos): weakref.finalize(df, self._descartar_df, id(df))
+            self._arquivos[(id(df), chave)] = conteudo
+            self._bytes += len(conteudo)
+            while len(self._arquivos) > self.max_arquivos or self._bytes > self.max_bytes:
+                _, antigo = self._arquivos.popitem(last=False)
+                self._bytes -= len(antigo)
+
+    def _descartar_df(self, id_df):
+        with self._lock:
+            for chave in [c for c in self._arquivos if c[0] == id_df]: self._bytes -= len(self._arquivos.pop(chave))
+
+
+# Instância única usada pelo app (compartilhada entre sessões e reexecuções).
+CACHE_EXPORTACOES = CacheExportacoes()
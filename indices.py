@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+# --- Índices chave -> posições ---
+# Usados pela visão consolidada (ID e proponente -> linhas) e pela busca (trigrama -> valores do
+# vocabulário): montados uma vez por versão dos dados e consultados a cada interação do painel.
+SEM_POSICOES = np.array([], dtype=np.intp)
+
+
+class IndiceHash:
+    """Chave -> posições das linhas: as chaves distintas ficam numa tabela hash (`pd.Index`) e as posições,
+    agrupadas por chave num único array, são fatiadas na consulta (sem um array por chave na construção)."""
+
+    def __init__(self, serie):
+        codigos, chaves = pd.factorize(serie) # vazios recebem -1 e ficam de fora
+        self.chaves = pd.Index(chaves)
+        if len(chaves): self.chaves.get_loc(chaves[0]) # monta a tabela hash agora, não na primeira consulta
+        ordem = np.argsort(codigos, kind='stable')
+        self._posicoes = ordem[codigos[ordem] >= 0]
+        self._inicios = np.searchsorted(codigos[self._posicoes], np.arange(len(chaves) + 1))
+
+    def __len__(self): return len(self.chaves)
+
+    def posicoes(self, chave):
+        """Posições (em ordem crescente) das linhas com `chave`; vazio se a chave não existe."""
+        try: i = self.chaves.get_loc(chave)
+        except KeyError: return SEM_POSICOES
+        return self._posicoes[self._inicios[i]:self._inicios[i + 1]]
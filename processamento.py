@@ -0,0 +1,224 @@
+"""Leitura e classificação das planilhas de TEDs e Convênios, sem dependência do Streamlit.
+
+Usado pelo painel (`app_ted_alert.py`) e pela execução em lote (`alertas_batch.py`).
+"""
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# --- Nomes dos arquivos base de dados ---
+# Cada fonte pode ser um arquivo, um diretório ou um padrão glob (ex.: 'regionais/*/Convenios*.xlsx');
+# as variáveis de ambiente permitem apontar para as planilhas das unidades sem mudar o código.
+ARQUIVO_TEDS_ENVIADOS = os.environ.get('ALERTAS_TEDS_ENVIADOS', 'TED Alert.xlsx')
+ARQUIVO_TEDS_RECEBIDOS = os.environ.get('ALERTAS_TEDS_RECEBIDOS', 'TED Recebido.xlsx')
+ARQUIVO_CONVENIOS = os.environ.get('ALERTAS_CONVENIOS', 'Convenios.xlsx')
+
+# --- Função Auxiliar para Converter Moeda ---
+def converter_valor_monetario(valor):
+    if pd.isna(valor): return 0.0
+    if isinstance(valor, (int, float, np.number)): return float(valor)
+    if isinstance(valor, str):
+        limpo = valor.replace('R$', '').strip()
+        num_virgulas = limpo.count(',')
+        if num_virgulas == 1 and '.' in limpo:
+            if limpo.rfind('.') < limpo.rfind(','): # 1.234,56
+                 limpo = limpo.replace('.', '')
+                 limpo = limpo.replace(',', '.')
+            else: limpo = limpo.replace(',', '') # 1,234.56
+        elif num_virgulas == 1:
+            if len(limpo.split(',')[-1]) == 2: limpo = limpo.replace(',', '.')
+            else: limpo = limpo.replace(',', '')
+        elif num_virgulas == 0 and '.' in limpo:
+            partes = limpo.split('.')
+            if len(partes) > 1 and len(partes[-1]) != 2:
+                 limpo = "".join(partes)
+        convertido = pd.to_numeric(limpo, errors='coerce')
+        return float(convertido) if pd.notnull(convertido) else 0.0
+    return 0.0
+
+def converter_valores_monetarios(serie):
+    """Versão vetorizada de `converter_valor_monetario` para uma coluna inteira.
+
+    Devolve `(valores, num_coagidos)`: a Series em float64, com as mesmas regras da função
+    escalar, e quantos valores preenchidos não puderam ser lidos e viraram 0.0.
+    """
+    valores, coagidos = _converter_valores_monetarios(serie)
+    return valores, int(coagidos.sum())
+
+def _converter_valores_monetarios(serie):
+    """Como `converter_valores_monetarios`, mas com a máscara (por linha) dos valores coagidos a 0.0."""
+    coagidos = np.zeros(len(serie), dtype=bool)
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return serie.astype('float64').fillna(0.0), coagidos
+    valores = np.zeros(len(serie), dtype='float64')
+    preenchido = serie.notna().to_numpy()
+    try: eh_texto = serie.str.len().notna().to_numpy()
+    except AttributeError: eh_texto = np.zeros(len(serie), dtype=bool) # coluna sem nenhum texto
+
+    pos_outros = np.flatnonzero(preenchido & ~eh_texto)
+    outros = serie.iloc[pos_outros]
+    eh_numero = outros.map(lambda v: isinstance(v, (int, float, np.number))).to_numpy(dtype=bool)
+    valores[pos_outros[eh_numero]] = outros[eh_numero].astype('float64').to_numpy()
+    coagidos[pos_outros[~eh_numero]] = True
+
+    pos_texto = np.flatnonzero(eh_texto)
+    if len(pos_texto):
+        limpo = serie.iloc[pos_texto].astype(str).str.replace('R$', '', regex=False).str.strip()
+        num_virgulas = limpo.str.count(',')
+        pos_ponto, pos_virgula, tamanho = limpo.str.rfind('.'), limpo.str.rfind(','), limpo.str.len()
+        tem_ponto = pos_ponto >= 0
+        uma_virgula_com_ponto = (num_virgulas == 1) & tem_ponto
+        formato_br = uma_virgula_com_ponto & (pos_ponto < pos_virgula) # 1.234,56
+        formato_us = uma_virgula_com_ponto & (pos_ponto > pos_virgula) # 1,234.56
+        so_virgula = (num_virgulas == 1) & ~tem_ponto
+        decimal_virgula = so_virgula & (tamanho - pos_virgula - 1 == 2) # 1234,56
+        milhar_ponto = (num_virgulas == 0) & tem_ponto & (tamanho - pos_ponto - 1 != 2) # 1.234
+
+        limpo = limpo.mask(formato_br | milhar_ponto, limpo.str.replace('.', '', regex=False))
+        limpo = limpo.mask(formato_br | decimal_virgula, limpo.str.replace(',', '.', regex=False))
+        limpo = limpo.mask(formato_us | (so_virgula & ~decimal_virgula), limpo.str.replace(',', '', regex=False))
+        convertido = pd.to_numeric(limpo, errors='coerce').astype('float64').to_numpy()
+        falhou = np.isnan(convertido)
+        valores[pos_texto] = np.where(falhou, 0.0, convertido)
+        coagidos[pos_texto] = falhou & (limpo != '').to_numpy() # texto vazio conta como célula vazia
+    return pd.Series(valores, index=serie.index, name=serie.name), coagidos
+
+# --- Identificador dos itens ---
+def _texto_id_item(valor):
+    if isinstance(valor, (float, np.floating)) and float(valor).is_integer(): return str(int(valor)) # nº lido como float: '1234', não '1234.0'
+    return str(valor).strip()
+
+def normalizar_id_item(serie):
+    """'ID_Item' como texto comparável entre fontes e com o que o usuário digita (vazios continuam vazios).
+
+    Uma coluna de números com células vazias vem do Excel como float (1234.0); sem o ajuste, o '1234'
+    digitado nunca casaria com '1234.0'.
+    """
+    codigos, unicos = pd.factorize(serie) # poucos IDs repetidos, mas converte cada valor distinto uma vez
+    textos = np.array([_texto_id_item(v) for v in unicos] + [np.nan], dtype=object) # código -1 (vazio) -> NaN
+    return pd.Series(textos[codigos], index=serie.index, name=serie.name)
+
+# --- Classificação de prazos ---
+LIMITE_PROXIMO_DIAS = 15 # até aqui (inclusive) o item é 'Próximo'
+LIMITE_ATENCAO_DIAS = 30 # até aqui (inclusive) o item é 'Atenção'
+
+def rotulos_status_prazo(limite_proximo=LIMITE_PROXIMO_DIAS, limite_atencao=LIMITE_ATENCAO_DIAS):
+    return {
+        'atrasado': 'Atrasado',
+        'proximo': f'Próximo (<= {limite_proximo}d)',
+        'atencao': f'Atenção ({limite_proximo + 1}-{limite_atencao}d)',
+        'ok': f'Prazo OK (> {limite_atencao}d)',
+        'concluido': 'Concluído',
+        'indefinido': 'Vigência Indefinida',
+        'concluido_indefinido': 'Concluído (Vig. Indef.)',
+    }
+
+ROTULOS_STATUS_PRAZO = rotulos_status_prazo()
+STATUS_PRAZO_ATRASADO = ROTULOS_STATUS_PRAZO['atrasado']
+STATUS_PRAZO_PROXIMO = ROTULOS_STATUS_PRAZO['proximo']
+STATUS_PRAZO_ATENCAO = ROTULOS_STATUS_PRAZO['atencao']
+STATUS_PRAZO_OK = ROTULOS_STATUS_PRAZO['ok']
+STATUS_PRAZO_CONCLUIDO = ROTULOS_STATUS_PRAZO['concluido']
+STATUS_PRAZO_INDEFINIDO = ROTULOS_STATUS_PRAZO['indefinido']
+STATUS_PRAZO_CONCLUIDO_INDEF = ROTULOS_STATUS_PRAZO['concluido_indefinido']
+
+def classificar_prazos(df, hoje=None, limite_proximo=LIMITE_PROXIMO_DIAS, limite_atencao=LIMITE_ATENCAO_DIAS):
+    """Acrescenta 'Dias Restantes', 'Dias Atraso' e 'Status Prazo' (categórica) ao DataFrame, numa passada só.
+
+    Espera as colunas internas 'Data Pagamento' (datetime) e 'Status' (texto).
+    """
+    if hoje is None: hoje = datetime.now().date()
+    rotulos = rotulos_status_prazo(limite_proximo, limite_atencao)
+    dias = (df['Data Pagamento'] - pd.Timestamp(hoje)).dt.days # negativo = atrasado; NaN = sem data
+    d = dias.to_numpy(dtype='float64', na_value=np.nan)
+    sem_data = np.isnan(d)
+    concluido = (df['Status'].str.lower() == 'concluído').to_numpy()
+    status_prazo = np.select(
+        [sem_data & ~concluido, sem_data, concluido, d < 0, d <= limite_proximo, d <= limite_atencao],
+        [rotulos['indefinido'], rotulos['concluido_indefinido'], rotulos['concluido'], rotulos['atrasado'], rotulos['proximo'], rotulos['atencao']],
+        default=rotulos['ok'])
+    df['Dias Restantes'] = dias.clip(lower=0)
+    df['Dias Atraso'] = (0 - dias).clip(lower=0).fillna(0)
+    df['Status Prazo'] = pd.Categorical(status_prazo, categories=sorted(rotulos.values()))
+    return df
+
+# --- Esquemas das fontes: colunas da planilha -> colunas internas ---
+ESQUEMAS_FONTES = {
+    "TEDs_Enviados": {
+        'tipo_item_str': "TED Enviado",
+        'map_colunas': {'TED': 'ID_Item', 'Objeto': 'Objeto', 'Convenente': 'Proponente', 'Data Pagamento': 'Data Pagamento', 'Status': 'Status', 'Valor (Opcional)': 'Valor_Calculo'},
+        'data_dayfirst': False,
+        'data_obrigatoria': True, # TEDs enviados sem data de pagamento são erro de planilha
+        'descricao_data': "'Data Pagamento'",
+    },
+    "TEDs_Recebidos": {
+        'tipo_item_str': "TED Recebido",
+        # Adicione 'ANO' e 'VIGÊNCIA' (range) ao map_colunas se quiser usá-los diretamente
+        'map_colunas': {'Nº CONVÊNIO': 'ID_Item', 'PROCESSO': 'Objeto', 'UNIDADE DESCENTRALIZADORA': 'Proponente', 'FIM DE VIGÊNCIA': 'Data Pagamento', 'SITUAÇÃO': 'Status', 'VALOR': 'Valor_Calculo'},
+        'data_dayfirst': True,
+        'data_obrigatoria': False, # sem fim de vigência -> 'Vigência Indefinida'
+        'descricao_data': "'Data Pagamento' (FIM DE VIGÊNCIA)",
+    },
+    "Convenios": {
+        'tipo_item_str': "Convênio",
+        'map_colunas': {'Nº CONVÊNIO': 'ID_Item', 'PROCESSO': 'Objeto', 'PROPONENTE': 'Proponente', 'FIM DE VIGÊNCIA': 'Data Pagamento', 'SITUAÇÃO': 'Status', 'VALOR': 'Valor_Calculo'},
+        'data_dayfirst': True,
+        'data_obrigatoria': False,
+        'descricao_data': "'Data Pagamento' (FIM DE VIGÊNCIA)",
+    },
+}
+
+# --- Processamento em duas camadas ---
+# A camada base (nomes internos, datas e valores convertidos, status normalizado) só depende da
+# planilha e pode ficar em cache/snapshot indefinidamente. As colunas de prazo dependem do dia de
+# referência e são derivadas dela com uma única diferença de datas, sem reler nem reconverter nada.
+
+def preparar_base(df_input, esquema):
+    """Devolve `(base, erro)`: o DataFrame da planilha com as colunas internas, sem as colunas de prazo."""
+    df = df_input.copy()
+    tipo_item_str = esquema['tipo_item_str']
+    colunas_faltantes = [col for col in esquema['map_colunas'] if col not in df.columns]
+    if colunas_faltantes: return None, f"Colunas {tipo_item_str} obrigatórias não encontradas: {', '.join(colunas_faltantes)}."
+    df = df.rename(columns=esquema['map_colunas'])
+
+    try: df['Data Pagamento'] = pd.to_datetime(df['Data Pagamento'], dayfirst=esquema['data_dayfirst'], errors='coerce')
+    except Exception as e: return None, f"Erro {tipo_item_str} - Converter {esquema['descricao_data']}: {e}."
+    if esquema['data_obrigatoria'] and df['Data Pagamento'].isnull().any(): return None, f"Erro {tipo_item_str} - Verifique formato/ausência em {esquema['descricao_data']}."
+
+    # 'Valor_Coagido' marca a linha (e não só o total), para a contagem continuar certa quando só
+    # as linhas alteradas da planilha são reprocessadas (`atualizacao.processar_delta`).
+    df['Valor_Calculo'], df['Valor_Coagido'] = _converter_valores_monetarios(df['Valor_Calculo'])
+    df.attrs['valores_coagidos'] = int(df['Valor_Coagido'].sum())
+    # Status como categoria: a comparação com 'concluído' em `classificar_prazos` passa a ser feita só nas categorias.
+    df['Status'] = df['Status'].astype(str).astype('category'); df['Objeto'] = df['Objeto'].astype(str); df['Proponente'] = df['Proponente'].astype(str)
+    df.attrs['data_obrigatoria'] = esquema['data_obrigatoria']
+    return df, None
+
+def derivar_prazos(base, data_referencia=None, limite_proximo=LIMITE_PROXIMO_DIAS, limite_atencao=LIMITE_ATENCAO_DIAS):
+    """Camada de prazos sobre a base: novo DataFrame (cópia rasa, a base não é alterada) com
+    'Dias Restantes', 'Dias Atraso' e 'Status Prazo' calculados para `data_referencia` (padrão: hoje)."""
+    df = classificar_prazos(base.copy(deep=False), data_referencia, limite_proximo, limite_atencao)
+    if not base.attrs.get('data_obrigatoria', True): df['Dias Restantes'] = df['Dias Restantes'].astype('float64') # vazio quando não há data
+    return df
+
+def processar_dados_df(df_input, esquema, hoje=None):
+    base, erro = preparar_base(df_input, esquema)
+    if erro: return None, erro
+    return derivar_prazos(base, hoje), None
+
+def preparar_base_teds_enviados(df_input): return preparar_base(df_input, ESQUEMAS_FONTES["TEDs_Enviados"])
+def preparar_base_teds_recebidos(df_input): return preparar_base(df_input, ESQUEMAS_FONTES["TEDs_Recebidos"])
+def preparar_base_convenios(df_input): return preparar_base(df_input, ESQUEMAS_FONTES["Convenios"])
+
+def processar_dados_df_teds_enviados(df_input): return processar_dados_df(df_input, ESQUEMAS_FONTES["TEDs_Enviados"])
+def processar_dados_df_teds_recebidos(df_input): return processar_dados_df(df_input, ESQUEMAS_FONTES["TEDs_Recebidos"])
+def processar_dados_df_convenios(df_input): return processar_dados_df(df_input, ESQUEMAS_FONTES["Convenios"])
+
+# --- Fontes conhecidas: tipo de relatório -> (arquivo padrão, preparador da camada base) ---
+FONTES = {
+    "TEDs_Enviados": (ARQUIVO_TEDS_ENVIADOS, preparar_base_teds_enviados),
+    "TEDs_Recebidos": (ARQUIVO_TEDS_RECEBIDOS, preparar_base_teds_recebidos),
+    "Convenios": (ARQUIVO_CONVENIOS, preparar_base_convenios),
+}
@@ -0,0 +1,101 @@
+"""O delta (`atualizacao.processar_delta`) tem de dar o mesmo DataFrame e os mesmos `attrs` de uma carga
+completa da mesma planilha: as linhas reaproveitadas foram convertidas com as inferências da versão
+anterior (ex.: o formato de data que o `pd.to_datetime` deduz da primeira linha preenchida)."""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, 'benchmarks')]
+
+from benchmark_alertas import gerar_dataframe_sintetico  # noqa: E402
+from carregamento import CachePlanilhas, ler_e_processar  # noqa: E402
+from instrumentacao import iniciar_coleta  # noqa: E402
+from processamento import FONTES  # noqa: E402
+
+LINHAS = 400
+COLUNA_DATA = {'TEDs_Enviados': 'Data Pagamento', 'TEDs_Recebidos': 'FIM DE VIGÊNCIA', 'Convenios': 'FIM DE VIGÊNCIA'}
+COLUNA_VALOR = {'TEDs_Enviados': 'Valor (Opcional)', 'TEDs_Recebidos': 'VALOR', 'Convenios': 'VALOR'}
+
+
+def recarregar(pasta, tipo, raw, editar):
+    """Carrega `raw`, grava a versão editada e recarrega pelo cache. Confere com a carga completa e
+    devolve `(linhas processadas pelo delta ou None, mudança registrada ou None)`."""
+    caminho, preparador = str(pasta / f'{tipo}.xlsx'), FONTES[tipo][1]
+    raw.to_excel(caminho, index=False)
+    cache = CachePlanilhas()
+    _, erro = cache.carregar(caminho, preparador)
+    assert erro is None
+    editar(raw.copy()).to_excel(caminho, index=False)
+    coleta = iniciar_coleta()
+    df, erro = cache.carregar(caminho, preparador)
+    completo, erro_completo = ler_e_processar(caminho, preparador)
+    assert (erro is None) == (erro_completo is None), (erro, erro_completo)
+    if erro is None:
+        pd.testing.assert_frame_equal(df, completo)
+        assert df.attrs == completo.attrs
+    delta = [r for r in coleta if r['etapa'] == 'processar_delta' and 'linhas_processadas' in r]
+    return (delta[0]['linhas_processadas'] if delta else None), (cache.mudancas[-1] if cache.mudancas else None)
+
+
+def datas_em_texto(raw, tipo):
+    """Datas todas como texto dd/mm/aaaa, para a inferência de formato depender da primeira linha."""
+    raw[COLUNA_DATA[tipo]] = [f'{(i % 28) + 1:02d}/{(i % 12) + 1:02d}/2025' for i in range(len(raw))]
+    raw.loc[0, COLUNA_DATA[tipo]] = '13/02/2024'
+    return raw
+
+
+@pytest.mark.parametrize('tipo', list(FONTES))
+def test_edicoes_insercoes_e_remocoes(tmp_path, tipo):
+    def editar(raw):
+        raw.loc[5, COLUNA_VALOR[tipo]] = 'lixo'
+        raw.loc[6, COLUNA_DATA[tipo]] = datetime.now() - timedelta(days=3)
+        raw.loc[7, COLUNA_DATA[tipo]] = datetime.now() + timedelta(days=5)
+        raw = raw.drop(index=[10, 11])
+        novo = raw.iloc[[1]].copy()
+        novo.iloc[0, 0] = 'NOVO-1'
+        return pd.concat([raw, novo], ignore_index=True)
+    processadas, mudanca = recarregar(tmp_path, tipo, gerar_dataframe_sintetico(tipo, LINHAS, semente=7), editar)
+    assert processadas is not None and processadas <= 4
+    assert (mudanca['novos'], mudanca['removidos']) == (1, 2)
+
+
+@pytest.mark.parametrize('tipo', list(FONTES))
+@pytest.mark.parametrize('editar', [
+    lambda raw, c: raw.assign(**{c: raw[c].where(raw.index != 0, '2024-02-13')}), # data do topo em outro formato
+    lambda raw, c: raw.drop(index=0).reset_index(drop=True), # linha do topo removida
+    lambda raw, c: raw.assign(**{c: raw[c].where(raw.index != 50, '01/01/2025')}), # data no meio: o delta vale
+], ids=['topo_iso', 'topo_removido', 'meio'])
+def test_linha_de_contexto(tmp_path, tipo, editar):
+    recarregar(tmp_path, tipo, datas_em_texto(gerar_dataframe_sintetico(tipo, LINHAS, semente=3), tipo), lambda raw: editar(raw, COLUNA_DATA[tipo]))
+
+
+@pytest.mark.parametrize('tipo', ['TEDs_Recebidos', 'Convenios'])
+def test_celula_que_muda_o_dtype_da_coluna(tmp_path, tipo):
+    """Apagar um 'ANO' (int64 -> float64, coluna que o processador nem usa) não pode mudar o hash das
+    demais linhas nem contar como item alterado."""
+    raw = gerar_dataframe_sintetico(tipo, LINHAS, semente=5)
+    def editar(raw):
+        raw['ANO'] = raw['ANO'].astype('float64')
+        raw.loc[3, 'ANO'] = np.nan
+        return raw
+    processadas, mudanca = recarregar(tmp_path, tipo, raw, editar)
+    assert processadas == 1
+    assert (mudanca['novos'], mudanca['removidos'], mudanca['modificados']) == (0, 0, 0)
+
+
+@pytest.mark.parametrize('tipo', ['TEDs_Recebidos', 'Convenios'])
+def test_texto_numa_coluna_de_numeros(tmp_path, tipo):
+    raw = gerar_dataframe_sintetico(tipo, LINHAS, semente=5)
+    raw['VALOR'] = pd.to_numeric(raw['VALOR'], errors='coerce').fillna(0.0) # coluna só de números
+    def editar(raw):
+        raw['VALOR'] = raw['VALOR'].astype(object)
+        raw.loc[4, 'VALOR'] = 'R$ 1.234,56'
+        return raw
+    processadas, mudanca = recarregar(tmp_path, tipo, raw, editar)
+    assert processadas == 1
+    assert mudanca['modificados'] == 1
@@ -0,0 +1,97 @@
+import fnmatch
+import glob
+import logging
+import os
+import threading
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError: # sem watchdog o painel continua conferindo as planilhas a cada atualização da página
+    FileSystemEventHandler, Observer = object, None
+
+from instrumentacao import medir
+
+# --- Vigia das planilhas ---
+# Observa as pastas das fontes e, quando uma planilha é gravada, recarrega aquela fonte em segundo
+# plano pelo cache (que reprocessa só as linhas alteradas). O painel compara `versao` com a última
+# que exibiu para saber quando atualizar a página.
+ESPERA_EVENTOS_SEGUNDOS = 2.0 # o Excel grava em etapas (arquivo temporário, renomeação): espera acalmar
+_log = logging.getLogger(__name__)
+
+
+def diretorio_observado(fonte):
+    if os.path.isdir(fonte): return os.path.abspath(fonte)
+    if glob.has_magic(fonte):
+        prefixo = []
+        for parte in os.path.abspath(fonte).split(os.sep):
+            if glob.has_magic(parte): break
+            prefixo.append(parte)
+        return os.sep.join(prefixo) or os.sep
+    return os.path.dirname(os.path.abspath(fonte))
+
+
+def pertence_a_fonte(caminho, fonte):
+    caminho = os.path.abspath(caminho)
+    if os.path.basename(caminho).startswith('~$'): return False # arquivo de trava do Excel
+    if os.path.isdir(fonte): return os.path.dirname(caminho) == os.path.abspath(fonte) and caminho.endswith('.xlsx')
+    if glob.has_magic(fonte): return fnmatch.fnmatch(caminho, os.path.abspath(fonte))
+    return caminho == os.path.abspath(fonte)
+
+
+class VigiaPlanilhas(FileSystemEventHandler):
+    def __init__(self, fontes, cache, espera=ESPERA_EVENTOS_SEGUNDOS):
+        """`fontes` é `{tipo: (fonte, preparador)}`, como `processamento.FONTES` (fonte: arquivo, diretório ou glob)."""
+        self.fontes, self.cache, self.espera = fontes, cache, espera
+        self.versao = 0
+        self.erros = {} # tipo -> mensagem da última recarga que falhou (exibida no painel)
+        self._pendentes, self._timer, self._lock = set(), None, threading.Lock()
+        self._observador = Observer()
+        pastas = {diretorio_observado(fonte) for fonte, _ in fontes.values()}
+        for pasta in pastas:
+            if os.path.isdir(pasta): self._observador.schedule(self, pasta, recursive=any(glob.has_magic(f) for f, _ in fontes.values()))
+        self._observador.daemon = True
+        self._observador.start()
+
+    def on_any_event(self, evento):
+        if evento.is_directory or evento.event_type not in ('created', 'modified', 'moved', 'deleted'): return
+        caminhos = [c for c in (evento.src_path, getattr(evento, 'dest_path', '')) if c]
+        tipos = {tipo for tipo, (fonte, _) in self.fontes.items() if any(pertence_a_fonte(c, fonte) for c in caminhos)}
+        if not tipos: return
+        with self._lock:
+            self._pendentes |= tipos
+            if self._timer is not None: self._timer.cancel()
+            self._timer = threading.Timer(self.espera, self._atualizar)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _atualizar(self):
+        with self._lock: tipos, self._pendentes = self._pendentes, set()
+        for tipo in tipos:
+            fonte, preparador = self.fontes[tipo]
+            # Falhas de leitura e validação voltam em `(df, erro)` e o painel as mostra; uma exceção aqui é
+            # defeito: fica registrada (log, métrica com 'falhou' e aviso no painel) e o vigia segue ativo.
+            try:
+                with medir('recarregar_vigia', fonte=tipo): self.cache.carregar_varios(fonte, preparador)
+            except Exception as e:
+                _log.exception("Vigia: falha ao recarregar %s", tipo)
+                self.erros[tipo] = f"{type(e).__name__}: {e}"
+            else: self.erros.pop(tipo, None)
+        with self._lock: self.versao += 1
+
+    def parar(self):
+        self._observador.stop()
+        with self._lock:
+            if self._timer is not None: self._timer.cancel()
+
+
+_vigia, _lock_vigia = None, threading.Lock()
+
+
+def iniciar_vigia(fontes, cache):
+    """Vigia único do processo (o Streamlit reexecuta o script, mas o vigia continua o mesmo); `None` sem watchdog."""
+    global _vigia
+    if Observer is None: return None
+    with _lock_vigia:
+        if _vigia is None: _vigia = VigiaPlanilhas(fontes, cache)
+    return _vigia